@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ensemble of the mono_hc island: herbivores only for 50 years, then carnivores are added.
+The replicates for all seeds run in parallel, and the mean and spread of the counts are printed.
+"""
+
+import textwrap
+from src.biosim.ensemble import run_ensemble
+
+geogr = """WWW
+           WLW
+           WWW"""
+geogr = textwrap.dedent(geogr)
+
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore',
+                       'age': 5,
+                       'weight': 20}
+                      for _ in range(50)]}]
+ini_carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore',
+                       'age': 5,
+                       'weight': 20}
+                      for _ in range(20)]}]
+
+if __name__ == '__main__':
+
+    result = run_ensemble(geogr, ini_herbs, seeds=range(100, 200), num_years=301,
+                          events={50: ini_carns})
+    for year in range(0, 301, 50):
+        print('Year {:3d}: herbivores {:7.1f} +- {:6.1f}, carnivores {:7.1f} +- {:6.1f}'.format(
+            year, result.mean[year, 0], result.variance[year, 0] ** 0.5,
+            result.mean[year, 1], result.variance[year, 1] ** 0.5))
@@ -1,5 +1,8 @@
+import itertools
 import math as m
-import random as rd
+from biosim.randomsource import random_source
+
+_versions = itertools.count(1)
 
 
 class animal(object):
@@ -8,7 +11,27 @@ class animal(object):
 
     :param weight: Float number representing the weight of an animal
     :param age: Integer representing the age of an animal
+
+    The random decisions draw from the :class:`randomsource.random_source` in :attr:`_random`.
+    Each island gives its own species copies a source seeded with the island seed.
+
+    The four fields of an animal are kept in slots, to save memory for large populations.
+    :class:`herbivore` and :class:`carnivore` also have a __dict__ slot, so a parameter can
+    still be overridden for one animal, e.g. ``individual.F = 20``; the dictionary is only
+    made for animals that are given such attributes. Dead animals can be handed to :func:`release`,
+    which keeps up to pool_size of them per species for :func:`newborn` to reuse.
+
+    :attr:`fitness` is cached together with the weight and age it was calculated for,
+    and only recalculated when it is read after the weight or age has changed,
+    or after :func:`update_params` has changed the parameters of the species.
+    The age factor of the fitness is looked up in a table per species,
+    which is cleared when :func:`update_params` runs.
     """
+    __slots__ = ('weight', 'age', 'migrated', '_fitness', '_fit_weight', '_fit_age',
+                 '_fit_version')
+    _random = random_source()
+    _params_version = 0
+    pool_size = 100000
     w_birth = None
     sigma_birth = None
     beta = None
@@ -24,14 +47,67 @@ class animal(object):
     omega = None
     F = None
     DeltaPhiMax = None
+    param_names = ('w_birth', 'sigma_birth', 'beta', 'eta', 'a_half', 'phi_age', 'w_half',
+                   'phi_weight', 'mu', 'gamma', 'zeta', 'xi', 'omega', 'F', 'DeltaPhiMax')
 
     def __init__(self, weight, age):
 
         self.weight = weight
         self.age = age
-        self.fitness = self.fitness_update()
+        self._fit_weight = None
+        self._fit_age = None
+        self._fit_version = None
         self.migrated = False
 
+    @property
+    def fitness(self):
+        """
+        The fitness of the animal, recalculated with :func:`fitness_update`
+        if the weight, age or species parameters have changed since it was last
+        calculated or set.
+        """
+        if (self.weight != self._fit_weight or self.age != self._fit_age
+                or self._fit_version != self._params_version):
+            self.fitness = self.fitness_update()
+        return self._fitness
+
+    @fitness.setter
+    def fitness(self, value):
+        self._fitness = value
+        self._fit_weight = self.weight
+        self._fit_age = self.age
+        self._fit_version = self._params_version
+
+    @classmethod
+    def _age_factor(cls, age):
+        """
+        Looks up the age factor of the fitness, extending the table of the species as needed.
+        Ages that are not non-negative integers are calculated directly.
+
+        :param age: the animal age
+        :return factor: float number between 0 and 1
+        """
+        table = cls.__dict__.get('_age_table')
+        if table is None:
+            table = cls._age_table = []
+        if type(age) is int and age >= 0:
+            while len(table) <= age:
+                table.append(1 / (1 + m.e ** (cls.phi_age * (len(table) - cls.a_half))))
+            return table[age]
+        return 1 / (1 + m.e ** (cls.phi_age * (age - cls.a_half)))
+
+    @classmethod
+    def _params_changed(cls):
+        """
+        Clears the age factor tables of the species and of all its subclasses,
+        and gives them a new parameter version, so the cached fitness of their animals
+        is recalculated.
+        """
+        cls._age_table = []
+        cls._params_version = next(_versions)
+        for subclass in cls.__subclasses__():
+            subclass._params_changed()
+
     def fitness_update(self):
         """
         Calculating the fitness of the animal; if the weight is negative or zero,
@@ -44,6 +120,7 @@ class animal(object):
 
         Where a is the animal age, w is the animal weight,
         and the rest are constants from the animals' species.
+        The first factor is taken from the age factor table of the species.
         :return fitness: float number between 0 and 1
         """
 
@@ -51,8 +128,8 @@ class animal(object):
             fitness = 0
 
         else:
-            fitness = (1 / (1 + m.e ** (self.phi_age * (self.age - self.a_half)))) * \
-                      (1 / (1 + m.e ** (-self.phi_weight * (self.weight - self.w_half))))
+            fitness = self._age_factor(self.age) * \
+                (1 / (1 + m.e ** (-self.phi_weight * (self.weight - self.w_half))))
         return fitness
 
     def birth(self, n_animals):
@@ -80,10 +157,10 @@ class animal(object):
         else:
             birth_proba = min(1, self.gamma * self.fitness * (n_animals - 1))
 
-            if rd.uniform(0, 1) <= birth_proba:
-                nw = rd.gauss(self.w_birth, self.sigma_birth)
+            if self._random.uniform() <= birth_proba:
+                nw = self._random.gauss(self.w_birth, self.sigma_birth)
                 if nw > 0 and ((self.xi * nw) < self.weight):
-                    return type(self)(nw, 0)
+                    return self.newborn(nw, 0)
                 else:
                     return None
 
@@ -109,7 +186,7 @@ class animal(object):
 
         else:
             death_proba = self.omega * (1 - self.fitness)
-            if rd.uniform(0, 1) <= death_proba:
+            if self._random.uniform() <= death_proba:
                 return True
 
             else:
@@ -130,7 +207,7 @@ class animal(object):
         """
 
         migration_proba = self.mu * self.fitness
-        if rd.uniform(0, 1) <= migration_proba and self.migrated is False:
+        if self._random.uniform() <= migration_proba and self.migrated is False:
             return True
         else:
             return False
@@ -138,14 +215,12 @@ class animal(object):
     def aging(self):
         """
         Increases the age of an animal and subtracts yearly weight loss.
-        Fitness is updated for the animal after the weight loss.
+        Fitness is updated for the animal when it is next read.
 
         """
 
         self.age += 1
         self.weight -= (self.eta * self.weight)
-
-        self.fitness = self.fitness_update()
         self.migrated = False
 
     @classmethod
@@ -158,12 +233,62 @@ class animal(object):
         """
 
         for param in paramchange.keys():
-            classname = cls.__name__
-            if param in dir(cls):
-                paramname = classname + '.' + param
-                exec("%s = %f" % (paramname, paramchange[param]))
+            if param in cls.param_names:
+                setattr(cls, param, float(paramchange[param]))
             else:
                 raise ValueError('Unknown parameter inserted')
+        cls._params_changed()
+
+    @classmethod
+    def get_params(cls):
+        """
+        Fetches the constant parameters of the animal type.
+
+        :return params: a dictionary with parameter names and their values.
+        """
+        return {param: getattr(cls, param) for param in cls.param_names}
+
+    @classmethod
+    def newborn(cls, weight, age):
+        """
+        Makes an animal of the species, reusing a released animal if there is one.
+
+        :param weight: Float number representing the weight of the animal
+        :param age: Integer representing the age of the animal
+        :return specie: the animal object.
+        """
+        pool = cls.__dict__.get('_pool')
+        if pool:
+            specie = pool.pop()
+            specie.__init__(weight, age)
+            return specie
+        return cls(weight, age)
+
+    def release(self):
+        """
+        Hands a dead animal to the pool of its species, for :func:`newborn` to reuse.
+        The animal must not be used anywhere else afterwards.
+        Animals with attributes of their own, such as a parameter override, are not kept.
+        """
+        if getattr(self, '__dict__', None):
+            return
+        cls = type(self)
+        if '_pool' not in cls.__dict__:
+            cls._pool = []
+        if len(cls._pool) < cls.pool_size:
+            cls._pool.append(self)
+
+    @classmethod
+    def copy_species(cls):
+        """
+        Makes a subclass of the animal type holding its own copy of every parameter.
+        Changing the parameters of the copy with :func:`update_params` affects neither
+        the animal type itself nor other copies, which lets every island own its
+        parameter table. All parameters are found directly on the copy.
+
+        :return species: the new subclass.
+        """
+        return type(cls.__name__, (cls,), dict(cls.get_params(), __slots__=()))
 
 
 class herbivore(animal):
@@ -174,6 +299,7 @@ class herbivore(animal):
     :param weight: Weight of the animal
 
     """
+    __slots__ = ('__dict__',)
     w_birth = 8
     sigma_birth = 1.5
     beta = 0.9
@@ -212,8 +338,6 @@ class herbivore(animal):
             self.weight += (self.beta * f_available)
             cur_fodder -= f_available
 
-        self.fitness = self.fitness_update()
-
         return cur_fodder
 
 
@@ -225,6 +349,7 @@ class carnivore(animal):
     :param weight: Weight of the animal
 
     """
+    __slots__ = ('__dict__',)
     w_birth = 6
     sigma_birth = 1
     beta = 0.75
@@ -248,7 +373,7 @@ class carnivore(animal):
         """
         Simulates the carnivore trying to eat the herbivores in a cell.
         The carnivore will try to eat herbivores as long as it has appetite (F)
-        , or until all herbivores are hunted.
+        , or until no herbivore weaker than itself is left.
         This is done by calculating the probability of the carnivore eating a given herbivore,
         and decides whether it will happen or not.
         If the fitness of a herbivore is larger than that of the carnivore
@@ -262,31 +387,33 @@ class carnivore(animal):
 
         Where :math:`\\Phi` is the fitness of the respective animals and :math:`\\Delta\\Phi_{max}`
         is a constant of the carnivores.
-        Carnivore fitness is updated after it has eaten what it wants or hunted all herbivores.
+        The carnivore hunts with the fitness it had before eating,
+        and its fitness is updated when it is next read.
 
         :param available_herbivores: list of herbivores in the cell, sorted by ascending fitness.
         :return living_herbivores: list of herbivores in the cell after the carnivore has hunted.
         """
 
         appetite = self.F
-        living_herbivores = available_herbivores
+        fitness = self.fitness
+        living_herbivores = []
 
-        for prey in available_herbivores:
+        for i, prey in enumerate(available_herbivores):
 
-            if prey.fitness > self.fitness:
-                p_eat = 0
+            if appetite <= 0 or prey.fitness >= fitness:
+                living_herbivores.extend(available_herbivores[i:])
+                break
 
-            elif (self.fitness - prey.fitness) > self.DeltaPhiMax:
+            elif (fitness - prey.fitness) > self.DeltaPhiMax:
                 p_eat = 1
 
             else:
-                p_eat = (self.fitness - prey.fitness) / self.DeltaPhiMax
+                p_eat = (fitness - prey.fitness) / self.DeltaPhiMax
 
-            if rd.uniform(0, 1) <= p_eat and appetite > 0:
-                living_herbivores.remove(prey)
+            if self._random.uniform() <= p_eat:
                 self.weight += prey.weight * self.beta
                 appetite -= prey.weight
-
-        self.fitness = self.fitness_update()
+            else:
+                living_herbivores.append(prey)
 
         return living_herbivores
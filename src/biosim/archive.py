@@ -0,0 +1,191 @@
+"""
+:mod:`archive` keeps the state of every animal for chosen years in memory-mapped files.
+
+Each field of the animals is written to its own series of chunk files,
+<field>_<chunk>.npy, each a .npy file of chunk_rows values made with
+:func:`numpy.lib.format.open_memmap`, and the years are appended one after the other.
+The index, index.npy, holds the year, first row and number of rows of every year written,
+so one year is read by mapping only the chunks holding its rows,
+however large the archive has grown.
+The writer never holds more than the year it is writing, and an archive can be
+appended to by a new writer, e.g. after a simulation is resumed from a checkpoint.
+"""
+
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+from biosim.checkpoint import animal_arrays
+
+SPECIES = ('herbivore', 'carnivore')
+FIELDS = (('cell', np.int64), ('species', np.int8), ('age', np.int64),
+          ('weight', np.float64), ('fitness', np.float64))
+
+
+def _chunk_path(directory, field, number):
+    return os.path.join(directory, '{}_{:05d}.npy'.format(field, number))
+
+
+class archive_writer:
+    """
+    Appends the animals of a year to an archive.
+
+    :param directory: directory of the archive, made if missing
+    :param chunk_rows: number of animals in each chunk file of a new archive
+
+    If the directory already holds an archive, the years are appended to it,
+    with its chunk size.
+    """
+
+    def __init__(self, directory, chunk_rows=1 << 20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta:
+                self.chunk_rows = json.load(meta)['chunk_rows']
+            self.index = np.load(os.path.join(directory, 'index.npy'))
+        else:
+            self.chunk_rows = chunk_rows
+            with open(meta_path, 'w') as meta:
+                json.dump({'chunk_rows': chunk_rows, 'species': SPECIES,
+                           'fields': [(name, np.dtype(dtype).str) for name, dtype in FIELDS]},
+                          meta)
+            self.index = np.zeros((0, 3), dtype=np.int64)
+            self._write_index()
+        self._chunk = None
+        self._chunk_number = None
+
+    @property
+    def n_rows(self):
+        """
+        Number of animals written to the archive.
+        """
+        if len(self.index) == 0:
+            return 0
+        return int(self.index[-1, 1] + self.index[-1, 2])
+
+    def _write_index(self):
+        """
+        Replaces the index file, in one step, so a reader never sees half an index.
+        """
+        path = os.path.join(self.directory, 'index.npy')
+        np.save(path + '.tmp.npy', self.index)
+        os.replace(path + '.tmp.npy', path)
+
+    def _open_chunk(self, number):
+        """
+        Maps the files of a chunk, making them if they are new.
+        """
+        if self._chunk_number != number:
+            self._chunk = {}
+            for name, dtype in FIELDS:
+                path = _chunk_path(self.directory, name, number)
+                if os.path.exists(path):
+                    self._chunk[name] = open_memmap(path, mode='r+')
+                else:
+                    self._chunk[name] = open_memmap(path, mode='w+', dtype=dtype,
+                                                    shape=(self.chunk_rows,))
+            self._chunk_number = number
+        return self._chunk
+
+    def append(self, year, columns):
+        """
+        Writes the animals of a year, which must be later than the years written before.
+
+        :param year: the year
+        :param columns: dictionary with an array for each field of :data:`FIELDS`
+        """
+        if len(self.index) > 0 and year <= self.index[-1, 0]:
+            raise ValueError('Year {} is not after the last year in the archive'.format(year))
+        n = len(columns['cell'])
+        start = self.n_rows
+        written = 0
+        while written < n:
+            number, offset = divmod(start + written, self.chunk_rows)
+            size = min(n - written, self.chunk_rows - offset)
+            chunk = self._open_chunk(number)
+            for name, _ in FIELDS:
+                chunk[name][offset:offset + size] = columns[name][written:written + size]
+                chunk[name].flush()
+            written += size
+        self.index = np.concatenate((self.index, [[year, start, n]]))
+        self._write_index()
+
+    def append_island(self, year, isl):
+        """
+        Writes the animals of both species on an island.
+
+        :param year: the year
+        :param isl: the :class:`island.island`
+        """
+        species = [animal_arrays(isl, name) for name in SPECIES]
+        columns = {name: np.concatenate([animals[name] for animals in species])
+                   for name in ('cell', 'age', 'weight', 'fitness')}
+        columns['species'] = np.repeat(np.arange(len(SPECIES)),
+                                       [len(animals['cell']) for animals in species])
+        self.append(year, columns)
+
+    def close(self):
+        """
+        Unmaps the chunk being written.
+        """
+        self._chunk = None
+        self._chunk_number = None
+
+
+class archive_reader:
+    """
+    Reads years from an archive written by :class:`archive_writer`.
+    Only the chunks holding the rows of the years read are mapped.
+
+    :param directory: directory of the archive
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as meta:
+            self.chunk_rows = json.load(meta)['chunk_rows']
+        self.index = np.load(os.path.join(directory, 'index.npy'))
+        self._chunks = {}
+
+    def years(self):
+        """
+        :return years: array with the years in the archive
+        """
+        return self.index[:, 0]
+
+    def _field_chunk(self, name, number):
+        if (name, number) not in self._chunks:
+            self._chunks[name, number] = np.load(_chunk_path(self.directory, name, number),
+                                                 mmap_mode='r')
+        return self._chunks[name, number]
+
+    def read(self, year, fields=None):
+        """
+        Reads the animals of a year.
+
+        :param year: the year
+        :param fields: names of the fields to read, all of :data:`FIELDS` if None
+        :return columns: dictionary with an array for each field.
+            The species field holds the position of the species in :data:`SPECIES`.
+        """
+        row = np.searchsorted(self.index[:, 0], year)
+        if row == len(self.index) or self.index[row, 0] != year:
+            raise KeyError('Year {} is not in the archive'.format(year))
+        _, start, n = self.index[row].tolist()
+        fields = [name for name, _ in FIELDS] if fields is None else fields
+        columns = {}
+        for name in fields:
+            pieces = [np.empty(0, dtype=dict(FIELDS)[name])]
+            position = start
+            while position < start + n:
+                number, offset = divmod(position, self.chunk_rows)
+                size = min(start + n - position, self.chunk_rows - offset)
+                pieces.append(self._field_chunk(name, number)[offset:offset + size])
+                position += size
+            columns[name] = np.concatenate(pieces)
+        return columns
+
+    def __getitem__(self, year):
+        return self.read(year)
@@ -1,4 +1,6 @@
 from biosim.animals import herbivore, carnivore
+from biosim import kernels
+import numpy as np
 import random as rd
 
 
@@ -7,6 +9,11 @@ class biome:
     The biome class represent a geographical area on the island.
     It can, if habitable, hold animals and contain food if highland or lowland.
 
+    The fodder of a cell is kept in a one-element array of its own,
+    until :func:`attach` places it in the fodder grid of an island.
+    Parameter changes made through :func:`update_params` only apply to cells
+    that are not part of an island; the island keeps its own f_max grid.
+
     :param loc: a tuple containing the coordinates of the cell.
     """
     f_max = None
@@ -14,15 +21,44 @@ class biome:
 
     def __init__(self, loc):
         self.loc = loc
-        self.fodder = self.f_max
+        self._fodder = np.array([self.f_max], dtype=float)
+        self._f_max = None
+        self._index = 0
         self.herb = []
         self.carn = []
 
+    @property
+    def fodder(self):
+        """
+        Amount of fodder currently in the cell.
+        """
+        return self._fodder[self._index]
+
+    @fodder.setter
+    def fodder(self, value):
+        self._fodder[self._index] = value
+
+    def attach(self, fodder, f_max, index):
+        """
+        Lets the cell keep its fodder in the fodder grid of an island,
+        and regrow to the value in the f_max grid of the island.
+
+        :param fodder: flat array with the fodder of all cells on the island.
+        :param f_max: flat array with the f_max of all cells on the island.
+        :param index: flat index of the cell in the arrays.
+        """
+        self._fodder = fodder
+        self._f_max = f_max
+        self._index = index
+
     def update_fodder(self):
         """
         Function to update fodder amount on yearly cycle
         """
-        self.fodder = self.f_max
+        if self._f_max is None:
+            self.fodder = self.f_max
+        else:
+            self.fodder = self._f_max[self._index]
 
     @staticmethod
     def change_animalparams(species, params):
@@ -41,50 +77,84 @@ class biome:
         else:
             raise KeyError('unknown species specified')
 
-    def add_population(self, pop):
+    def add_population(self, pop, species=None):
         """
         Function to add population in a specific cell.
 
         :param pop: List of dictionaries
+        :param species: dictionary mapping 'herbivore' and 'carnivore' to the animal classes
+            to create, :class:`animals.herbivore` and :class:`animals.carnivore` if None.
         """
+        if species is None:
+            species = {'herbivore': herbivore, 'carnivore': carnivore}
         for specie in pop:
             if specie['species'].lower() == 'herbivore':
-                self.herb.append(herbivore(specie['weight'], specie['age']))
+                self.herb.append(species['herbivore'](specie['weight'], specie['age']))
             elif specie['species'].lower() == 'carnivore':
-                self.carn.append(carnivore(specie['weight'], specie['age']))
+                self.carn.append(species['carnivore'](specie['weight'], specie['age']))
 
     def remove_population(self):
         """
         Simulates the yearly deaths in the cell.
-        Runs the :func:`animals.animal.death` function for all animals in the cell.
+        Runs the :func:`animals.animal.death` function for all animals in the cell,
+        and releases the dead animals to the pool of their species.
         """
-        self.herb[:] = [specie for specie in self.herb if not specie.death()]
-        self.carn[:] = [specie for specie in self.carn if not specie.death()]
+        self.herb[:] = self._survivors(self.herb, [not specie.death() for specie in self.herb])
+        self.carn[:] = self._survivors(self.carn, [not specie.death() for specie in self.carn])
 
-    def breeding(self):
+    @staticmethod
+    def _survivors(animals, alive):
+        """
+        Keeps the living animals, releasing the others with :func:`animals.animal.release`.
+
+        :param animals: list of animal objects.
+        :param alive: sequence with one boolean per animal, True for the living ones.
+        :return survivors: list of the living animals.
+        """
+        survivors = []
+        for specie, keep in zip(animals, alive):
+            if keep:
+                survivors.append(specie)
+            else:
+                specie.release()
+        return survivors
+
+    def breeding(self, rng=None):
         """
         Simulates the yearly births in the cell,
         adding the child objects and removing weight from mother.
-        Runs the :func:`animals.animal.birth` function for all animals in the cell.
+        The births for each species are decided in one step by :func:`kernels.breeding`,
+        after which the mothers' weight and fitness are updated
+        and the newborns are added in bulk.
+
+        :param rng: NumPy random generator, a new one seeded from :mod:`random` if None.
         """
-        baby_herb = []
-        baby_carn = []
-        n_herb = len(self.herb)
-        n_carn = len(self.carn)
-        for specie in self.herb:
-            result = specie.birth(n_herb)
-            if result is not None:
-                baby_herb.append(result)
-                specie.weight -= specie.xi * result.weight
-                specie.fitness_update()
-        self.herb.extend(baby_herb)
-        for specie in self.carn:
-            result = specie.birth(n_carn)
-            if result is not None:
-                baby_carn.append(result)
-                specie.weight -= specie.xi * result.weight
-                specie.fitness_update()
-        self.carn.extend(baby_carn)
+        if rng is None:
+            rng = np.random.default_rng(rd.getrandbits(64))
+        self.herb.extend(self._breeding(self.herb, rng))
+        self.carn.extend(self._breeding(self.carn, rng))
+
+    @staticmethod
+    def _breeding(animals, rng):
+        """
+        Decides the births for a list of animals of the same species.
+
+        :param animals: list of animal objects of one species.
+        :param rng: NumPy random generator.
+        :return newborns: list of the new animal objects.
+        """
+        if len(animals) < 2:
+            return []
+        species = type(animals[0])
+        weight = np.array([specie.weight for specie in animals], dtype=float)
+        fitness = np.array([specie.fitness for specie in animals], dtype=float)
+        mothers, newborn = kernels.breeding(weight, fitness, len(animals), species, rng)
+        weight = weight[mothers] - species.xi * newborn
+        fitness = kernels.fitness(weight, np.array([animals[i].age for i in mothers]), species)
+        for i, w, f in zip(mothers.tolist(), weight.tolist(), fitness.tolist()):
+            animals[i].weight = w
+            animals[i].fitness = f
+        return [species.newborn(w, 0) for w in newborn.tolist()]
 
     def aging(self):
         """
@@ -98,44 +168,99 @@ class biome:
         for specie in self.carn:
             specie.aging()
 
-    def grazing(self):
+    def aging_and_death(self, rng=None):
+        """
+        Runs the yearly aging and deaths for all animals in the cell in one step.
+        The weights and ages of each species are collected in arrays and passed to
+        :func:`kernels.aging_death`, after which the survivors are updated and kept.
+
+        :param rng: NumPy random generator, a new one seeded from :mod:`random` if None.
+        """
+        if rng is None:
+            rng = np.random.default_rng(rd.getrandbits(64))
+        self.herb[:] = self._aging_and_death(self.herb, rng)
+        self.carn[:] = self._aging_and_death(self.carn, rng)
+
+    @staticmethod
+    def _aging_and_death(animals, rng):
+        """
+        Ages a list of animals of the same species and removes the dead ones.
+
+        :param animals: list of animal objects of one species.
+        :param rng: NumPy random generator.
+        :return survivors: list of the animals that survived the year.
+        """
+        if len(animals) == 0:
+            return animals
+        weight = np.array([specie.weight for specie in animals], dtype=float)
+        age = np.array([specie.age for specie in animals])
+        weight, age, fitness, alive = kernels.aging_death(weight, age, type(animals[0]), rng)
+        survivors = biome._survivors(animals, alive)
+        for specie, w, a, f in zip(survivors, weight[alive].tolist(), age[alive].tolist(),
+                                   fitness[alive].tolist()):
+            specie.weight = w
+            specie.age = a
+            specie.fitness = f
+            specie.migrated = False
+        return survivors
+
+    def grazing(self, rng=None):
         """
         Simulates the yearly eating for the two species in the cell.
         Herbivores eat in random order, and carnivores eat in the order of descending fitness.
-        Runs the :func:`animals.herbivore.feeding` function for all herbivores in the cell.
-        Runs the :func:`animals.herbivore.feeding` function for all carnivores in the cell.
+        The herbivores graze through :func:`kernels.grazing`, which shuffles their order
+        with rng and shares out the fodder in one step.
+        The carnivores hunt through :func:`kernels.hunting`, which sorts the herbivores once,
+        after which the eaten herbivores are removed in one step.
+
+        :param rng: NumPy random generator, a new one seeded from :mod:`random` if None.
         """
-        for specie in self.herb:
-            if self.fodder > 0:
-                self.fodder = specie.feeding(self.fodder)
-        for specie in sorted(self.carn, key=lambda x: x.fitness, reverse=True):
-            if len(self.herb) > 0:
-                self.herb = specie.feeding(sorted(self.herb, key=lambda x: x.fitness))
-
-    def migration(self, cell_list):
-        """
-        Runs the migration for all animals in the cell, finding where the animal wants to go,
-        and if it is possible.
-        If it is possible, the animals are moved.
-        Runs the :func:`animals.herbivore.migration` function for all animals in the cell.
-
-        :param cell_list: List of the neighbouring cells to the current cell.
-        """
-
-        for i in range(len(self.herb) - 1, -1, -1):
-            if self.herb[i].migration():
-                choice = rd.choice(cell_list)
-                if choice.habitable:
-                    self.herb[i].migrated = True
-                    choice.herb.append(self.herb[i])
-                    del self.herb[i]
-        for i in range(len(self.carn) - 1, -1, -1):
-            if self.carn[i].migration():
-                choice = rd.choice(cell_list)
-                if choice.habitable:
-                    self.carn[i].migrated = True
-                    choice.carn.append(self.carn[i])
-                    del self.carn[i]
+        if rng is None:
+            rng = np.random.default_rng(rd.getrandbits(64))
+        if len(self.herb) > 0 and self.fodder > 0:
+            self._grazing(rng)
+        if len(self.carn) > 0 and len(self.herb) > 0:
+            self._hunting(rng)
+
+    def _grazing(self, rng):
+        """
+        Runs :func:`kernels.grazing` for the herbivores in the cell,
+        and writes the new weight and fitness back to the herbivores that ate.
+
+        :param rng: NumPy random generator.
+        """
+        species = type(self.herb[0])
+        eaten, left = kernels.grazing(np.zeros(len(self.herb), dtype=int),
+                                      np.array([self.fodder], dtype=float), species, rng)
+        self.fodder = left[0]
+        fed = np.flatnonzero(eaten > 0)
+        weight = np.array([self.herb[i].weight for i in fed], dtype=float) + \
+            species.beta * eaten[fed]
+        fitness = kernels.fitness(weight, np.array([self.herb[i].age for i in fed]), species)
+        for i, w, f in zip(fed.tolist(), weight.tolist(), fitness.tolist()):
+            self.herb[i].weight = w
+            self.herb[i].fitness = f
+
+    def _hunting(self, rng):
+        """
+        Runs :func:`kernels.hunting` for the carnivores and herbivores in the cell,
+        and writes the new weight and fitness back to the carnivores.
+
+        :param rng: NumPy random generator.
+        """
+        species = type(self.carn[0])
+        weight, alive = kernels.hunting(
+            np.array([specie.weight for specie in self.carn], dtype=float),
+            np.array([specie.fitness for specie in self.carn], dtype=float),
+            np.array([prey.weight for prey in self.herb], dtype=float),
+            np.array([prey.fitness for prey in self.herb], dtype=float),
+            species, rng)
+        fitness = kernels.fitness(weight, np.array([specie.age for specie in self.carn]),
+                                  species)
+        for specie, w, f in zip(self.carn, weight.tolist(), fitness.tolist()):
+            specie.weight = w
+            specie.fitness = f
+        self.herb[:] = self._survivors(self.herb, alive)
 
     @classmethod
     def update_params(cls, paramchange):
@@ -146,16 +271,9 @@ class biome:
         :param paramchange: A dictionary with the parameters to be changed,
         and the value they shall be changed to.
         """
-        # for param in paramchange[1].keys():
-        #     classname = cls.__name__
-        #     if param in dir(cls):
-        #         paramname = classname + '.' + param
-        #         exec("%s = %f" % (paramname, paramchange[1][param]))
         for param in paramchange.keys():
-            classname = cls.__name__
-            if param in dir(cls):
-                paramname = classname + '.' + param
-                exec("%s = %f" % (paramname, paramchange[param]))
+            if param == 'f_max':
+                setattr(cls, param, float(paramchange[param]))
             else:
                 raise ValueError('Unknown parameter inserted')
 
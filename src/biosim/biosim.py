@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
-import logging
+from biosim.archive import archive_writer
+import os
+from biosim import checkpoint
+import numpy as np
+from biosim.histograms import histogram_collector
 from biosim.island import island
+from biosim.record import year_record, year_snapshot
+from biosim.results import results_writer
+from biosim.sketches import population_sketches
 from biosim.visualization import Graphics
 import random as rd
 
@@ -18,7 +25,19 @@ class BioSim:
     :param img_base: String with beginning of file name for figures
     :param img_fmt: String with file type for figures, e.g. 'png'
     :param img_years: years between visualizations saved to files (default: vis_years)
-    :param log_file: If given, write animal counts to this file
+    :param log_file: If given, write animal counts to this file, see :class:`results.results_writer`
+    :param log_landscapes: If True, also write the animal counts per landscape type to log_file
+    :param log_flush_years: years of counts kept in memory before they are written to log_file
+    :param engine: 'object', 'array' or 'tiled', selecting how the island stores its animals
+    :param tiles: number of tiles and worker processes for the 'tiled' engine
+    :param transport: transport between the tiles for the 'tiled' engine, see :mod:`tiles`
+    :param stats_years: years between recording population statistics (if 0, none are recorded)
+    :param record_density: If True, keep the number of each species in every cell each year
+    :param checkpoint_dir: If given, write checkpoints to this directory while simulating
+    :param checkpoint_years: years between checkpoints written to checkpoint_dir
+    :param base_years: years between full checkpoints in checkpoint_dir
+    :param archive_dir: If given, archive the state of every animal in this directory
+    :param archive_years: years between the years archived in archive_dir
 
     If ymax_animals is None, the y-axis limit should be adjusted automatically.
     If cmax_animals is None, sensible, fixed default values should be used.
@@ -33,16 +52,39 @@ class BioSim:
     f'{os.path.join(img_dir, img_base}_{img_number:05d}.{img_fmt}'
     where img_number are consecutive image numbers starting from 0.
     img_dir and img_base must either be both None or both strings.
+    With engine='object', every animal is an object from :mod:`animals` in its cell.
+    With engine='array', the animals of each species are kept in a
+    :class:`population.population_store` of NumPy arrays, which scales to far larger populations.
+    With engine='tiled', the island is split into tiles run by worker processes, see :mod:`tiles`,
+    which are stopped by :func:`close`, or on leaving a ``with`` block around the simulation.
+    With stats_years, the weight, age and fitness of each species are kept in
+    :class:`sketches.kll_sketch` sketches for the start and every stats_years year,
+    fetched with :func:`population_stats`.
+    The counts of every year, from year 0, are kept in :attr:`record`,
+    a :class:`record.year_record`, with the density of each species if record_density is True.
+    With checkpoint_dir, a :class:`checkpoint.checkpoint_series` is written as the years are
+    simulated, with full checkpoints every base_years and deltas in between,
+    and any year written can be resumed with :func:`from_checkpoint`.
+    With the 'object' engine, every checkpoint written is a full checkpoint.
+    With archive_dir, the cell, species, age, weight and fitness of every animal are appended
+    to an :class:`archive.archive_writer` every archive_years year,
+    to be read a year at a time with :class:`archive.archive_reader`.
     Initial population is initialized through the :func:`island.island.add_population` function.
     The geographical map is made into a :class:`island.island` class object.
-    Visualization is initializes as a :class:`visualization.Graphics` object.
-    Logging is initialized.
+    Visualization is initializes as a :class:`visualization.Graphics` object,
+    unless vis_years is 0, in which case no figure is made at all.
+    The counts of each simulated year are written to log_file in blocks of log_flush_years,
+    as comma-separated text, or as a .npy file if the name ends in .npy,
+    and all years are written when a simulation ends.
     """
 
     def __init__(self, island_map, ini_pop, seed,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_dir=None, img_base=None, img_fmt='png', img_years=None,
-                 log_file=None):
+                 log_file=None, engine='object', stats_years=0, record_density=False,
+                 checkpoint_dir=None, checkpoint_years=1, base_years=10,
+                 archive_dir=None, archive_years=1, log_landscapes=False,
+                 log_flush_years=100, tiles=2, transport='queue'):
         self.ymax_animals = ymax_animals
         self.cmax_animals = cmax_animals
         self.vis_years = vis_years
@@ -55,15 +97,34 @@ class BioSim:
         self.island_map = island_map
         self.ini_pop = ini_pop
         self.seed = seed
-        self.island = island(island_map)
+        self.engine = engine
+        self.island = island(island_map, engine=engine, seed=seed, tiles=tiles,
+                             transport=transport)
         self.add_population(self.ini_pop)
         rd.seed(a=self.seed)
         self.cur_year = 0
-        self.graphs = Graphics(self.hist_specs, self.img_dir, self.img_base, self.img_fmt)
-        logging.basicConfig(filename=log_file, level=logging.INFO,
-                            format='[%(levelname)s]%(module)s.%(funcName)s - '
-                                   '%(asctime)s - %(message)s',
-                            filemode='w')
+        self.stats_years = stats_years
+        self._stats = {}
+        if self.stats_years != 0:
+            self._stats[0] = population_sketches(self.island)
+        self.record = year_record(self.island.shape, density=record_density)
+        self.checkpoint_years = checkpoint_years
+        self._checkpoints = None
+        if checkpoint_dir is not None:
+            self._checkpoints = checkpoint.checkpoint_series(checkpoint_dir, base_years)
+        self.archive_years = archive_years
+        self._archive = None
+        if archive_dir is not None:
+            self._archive = archive_writer(archive_dir)
+        self.record.append(self.cur_year, self.island)
+        self.graphs = None
+        if self.vis_years != 0:
+            self.graphs = Graphics(self.hist_specs, self.img_dir, self.img_base, self.img_fmt)
+        self.histograms = histogram_collector(self.hist_specs)
+        self._results = None
+        if log_file is not None:
+            self._results = results_writer(log_file, self.island, log_landscapes,
+                                           log_flush_years)
 
     def set_animal_parameters(self, species, params):
         """
@@ -91,6 +152,16 @@ class BioSim:
         else:
             self.island.change_landscapeparams(landscape, params)
 
+    def set_cell_parameters(self, loc, params):
+        """
+        Set parameters for a single cell, overriding those of its landscape type.
+        Passes the information down to the `island.island.change_cellparams` function.
+
+        :param loc: Tuple with the coordinates of the cell, starting at (1, 1)
+        :param params: Dict with valid parameter specification for the cell
+        """
+        self.island.change_cellparams(loc, params)
+
     def simulate(self, num_years):
         """
         Running simulation while visualizing the result.
@@ -98,33 +169,88 @@ class BioSim:
         Function :func:`visualization.Graphics.setup` is ran upon beginning.
         Function :func:`visualization.Graphics.update` is ran each year,
         with data from several functions from
-        the :class:`island.island` object.
+        the :class:`island.island` object,
+        and histograms made by :class:`histograms.histogram_collector`.
+        Without graphics, only the counts are recorded.
 
         :param num_years: number of years to simulate
+        :return record: the :class:`record.year_record` with the results of all years so far
         """
 
         if num_years != 0:
-            self.graphs.setup(self.cur_year + num_years, self.img_years, self.island_map)
-            for year in range(self.cur_year, self.cur_year + num_years):
-                self.cur_year += 1
-                if self.log_file is not None:
-                    logg_string = dict(Year=self.year, Total_Animals=self.island.animal_count(),
-                                       Animal_per_specie=self.island.species_count())
-                    logging.info(logg_string)
-                self.island.sim_year()
-                if self.vis_years != 0:
-                    if year % self.vis_years == 0:
-                        herb, carn = self.island.distrubution()
-                        all_animals = self.island.animal_count()
-                        n_herbivores = self.island.species_count()['Herbivore']
-                        n_carnivores = self.island.species_count()['Carnivore']
-                        w_herbivores, w_carnivores, f_herbivores, \
-                            f_carnivores, a_herbivores, a_carnivores = self.island.get_bincounts()
-                        self.graphs.update(year, herb, carn, all_animals, n_herbivores,
-                                           n_carnivores, w_herbivores, w_carnivores, f_herbivores,
-                                           f_carnivores, a_herbivores, a_carnivores)
+            for _ in self.iter_years(num_years):
+                pass
         else:
             raise ValueError('Invalid simulation years')
+        return self.record
+
+    def iter_years(self, num_years, density=False, stats=False, animals=False):
+        """
+        Simulates year by year, as :func:`simulate`, yielding a snapshot after each year.
+        The graphics are set up once, when the first year is asked for,
+        and the simulation can be stopped at any year by no longer asking for years.
+
+        :param num_years: number of years to simulate
+        :param density: if True, the snapshots have copies of the density grids
+        :param stats: if True, the snapshots have population statistics,
+            as given by :func:`population_stats`
+        :param animals: if True, the snapshots have copies of the weight, age and fitness
+            of every animal, as given by :func:`island.island.animal_columns`
+        :return snapshots: generator of :class:`record.year_snapshot`
+        """
+
+        if self.graphs is not None:
+            self.graphs.setup(self.cur_year + num_years, self.img_years, self.island_map)
+        try:
+            for year in range(self.cur_year, self.cur_year + num_years):
+                self._sim_year(year)
+                species_count = self.island.species_count()
+                snapshot = year_snapshot(self.cur_year, species_count['Herbivore'],
+                                         species_count['Carnivore'], None, None, None)
+                if density:
+                    snapshot = snapshot._replace(
+                        density=tuple(grid.copy() for grid in self.island.distrubution()))
+                if stats:
+                    snapshot = snapshot._replace(
+                        stats=self._stats.get(self.cur_year) or population_sketches(self.island))
+                if animals:
+                    snapshot = snapshot._replace(animals={
+                        species: {prop: np.array(values)
+                                  for prop, values in self.island.animal_columns(species).items()}
+                        for species in ('herbivore', 'carnivore')})
+                yield snapshot
+        finally:
+            if self._results is not None:
+                self._results.flush()
+
+    def _sim_year(self, year):
+        """
+        Simulates one year, recording and visualizing its results.
+
+        :param year: the year before the one simulated
+        """
+        self.cur_year += 1
+        self.island.sim_year()
+        self.record.append(self.cur_year, self.island)
+        if self._results is not None:
+            self._results.append(self.cur_year, self.island)
+        if self.stats_years != 0 and self.cur_year % self.stats_years == 0:
+            self._stats[self.cur_year] = population_sketches(self.island)
+        if self._checkpoints is not None and self.cur_year % self.checkpoint_years == 0:
+            self._checkpoints.add(self.cur_year, self._checkpoint_arrays())
+        if self._archive is not None and self.cur_year % self.archive_years == 0:
+            self._archive.append_island(self.cur_year, self.island)
+        if self.vis_years != 0:
+            if year % self.vis_years == 0:
+                herb, carn = self.island.distrubution()
+                all_animals = self.island.animal_count()
+                species_count = self.island.species_count()
+                n_herbivores = species_count['Herbivore']
+                n_carnivores = species_count['Carnivore']
+                histograms = self.histograms.collect(self.island)
+                self.graphs.update(year, herb, carn, all_animals, n_herbivores,
+                                   n_carnivores, histograms['herbivore'],
+                                   histograms['carnivore'])
 
     def add_population(self, population):
         """
@@ -136,6 +262,89 @@ class BioSim:
 
         self.island.add_population(population)
 
+    def population_stats(self, year):
+        """
+        Fetches the population statistics recorded for a year.
+        Each sketch gives e.g. the median with ``quantile(0.5)`` and the mean with ``mean``,
+        and sketches from several simulations can be merged with
+        :func:`sketches.merge_population_sketches`.
+
+        :param year: the year, 0 for the initial population
+        :return sketches: dictionary mapping species names to dictionaries with a
+            :class:`sketches.kll_sketch` for each of 'weight', 'age' and 'fitness'.
+        """
+        if year not in self._stats:
+            raise KeyError('No population statistics recorded for year {}'.format(year))
+        return self._stats[year]
+
+    def save_checkpoint(self, path):
+        """
+        Saves the state of the simulation to an .npz file, see :mod:`checkpoint`:
+        the animals, parameters and random generator states of the island,
+        the current year and the per-year record.
+        The population statistics are not saved.
+
+        :param path: file name or open file
+        """
+        checkpoint.save(path, self._checkpoint_arrays())
+
+    def _checkpoint_arrays(self):
+        """
+        Collects the state of the simulation as named arrays.
+        """
+        arrays = checkpoint.island_arrays(self.island)
+        arrays['island_map'] = np.array(self.island_map)
+        arrays['settings'] = checkpoint.text_array(
+            dict(seed=self.seed, year=self.cur_year, stats_years=self.stats_years,
+                 record_density=self.record.density is not None))
+        arrays['python_random_state'] = checkpoint.text_array(rd.getstate())
+        arrays.update({'record_' + name: values for name, values in self.record.arrays().items()})
+        return arrays
+
+    @classmethod
+    def from_checkpoint(cls, path, year=None, **kwargs):
+        """
+        Makes a simulation from a checkpoint saved by :func:`save_checkpoint`,
+        or from a year of the checkpoint_dir of a simulation,
+        continuing exactly as the saved simulation would have.
+
+        :param path: file name, open file or checkpoint directory
+        :param year: the year to resume from a checkpoint directory, the last year if None
+        :param kwargs: further arguments for :class:`BioSim`, e.g. vis_years or log_file.
+            The seed, engine, stats_years and record_density are those of the checkpoint
+            and cannot be given.
+        :return sim: the :class:`BioSim` at the year of the checkpoint
+
+        If log_file exists, the counts of the years up to the checkpoint are kept in it,
+        and the counts of the years simulated after resuming are written after them.
+        """
+        fixed = sorted({'seed', 'engine', 'stats_years', 'record_density'} & set(kwargs))
+        if fixed:
+            raise ValueError('A resumed simulation takes {} from the checkpoint'.format(
+                ', '.join(fixed)))
+        log_file = kwargs.pop('log_file', None)
+        if isinstance(path, (str, os.PathLike)) and os.path.isdir(path):
+            arrays = checkpoint.checkpoint_series(path).load(year)
+        else:
+            arrays = checkpoint.load(path)
+        settings = checkpoint.read_text(arrays['settings'])
+        sim = cls(str(arrays['island_map']), [], settings['seed'], engine=str(arrays['engine']),
+                  stats_years=settings['stats_years'],
+                  record_density=settings['record_density'], **kwargs)
+        checkpoint.restore_island(sim.island, arrays)
+        sim.cur_year = settings['year']
+        version, state, gauss_next = checkpoint.read_text(arrays['python_random_state'])
+        rd.setstate((version, tuple(state), gauss_next))
+        sim.record.restore({name[len('record_'):]: values for name, values in arrays.items()
+                            if name.startswith('record_')})
+        sim._stats = {}
+        if log_file is not None:
+            sim.log_file = log_file
+            sim._results = results_writer(log_file, sim.island, kwargs.get('log_landscapes', False),
+                                          kwargs.get('log_flush_years', 100),
+                                          resume_year=sim.cur_year)
+        return sim
+
     @property
     def year(self):
         """
@@ -170,6 +379,21 @@ class BioSim:
 
         return self.island.species_count()
 
+    def close(self):
+        """
+        Stops the worker processes of the 'tiled' engine and writes the buffered counts.
+        Runs the :func:`island.island.close` function.
+        """
+        if self._results is not None:
+            self._results.flush()
+        self.island.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def make_movie(self, movie_format):
         """
         Create MPEG4 movie from visualization images saved.
@@ -177,5 +401,7 @@ class BioSim:
 
         :param movie_format: String indicating the desired format of the movie.
         """
+        if self.graphs is None:
+            raise RuntimeError('No movie can be made without graphics (vis_years=0)')
 
         self.graphs.make_movie(movie_format)
@@ -0,0 +1,401 @@
+"""
+:mod:`checkpoint` saves the full state of an island as columns of NumPy arrays.
+
+Every species is kept as one array per column of :class:`population.population_store`,
+whatever the engine, together with the f_max and fodder grids, the landscape and animal
+parameters, the year and the states of all random generators.
+The arrays are written uncompressed with :func:`numpy.savez`, so saving and loading millions
+of animals takes about as long as copying their arrays, and no animal objects are pickled.
+Parameters and generator states are stored as JSON strings.
+
+A :class:`checkpoint_series` keeps checkpoints of many years, as a full base checkpoint
+now and then and compressed deltas in between, see :func:`delta_arrays`.
+"""
+
+import json
+import os
+import numpy as np
+from biosim import kernels
+from biosim.animals import herbivore, carnivore
+from biosim.population import population_store
+
+SPECIES = ('herbivore', 'carnivore')
+_ANIMAL_NAMES = {species + '_' + column for species in SPECIES
+                 for column in population_store.columns}
+
+
+def text_array(value):
+    """
+    :param value: a value that can be written as JSON
+    :return array: a NumPy string array holding the JSON text
+    """
+    return np.array(json.dumps(value))
+
+
+def read_text(array):
+    """
+    :param array: a NumPy string array made by :func:`text_array`
+    :return value: the value read from the JSON text
+    """
+    return json.loads(str(array))
+
+
+def animal_arrays(isl, species):
+    """
+    Fetches every column of the animals of a species on an island.
+    With the 'object' engine, the animals are read cell by cell in the order of the cell lists,
+    each animal's origin is its cell, and the ids number the animals in that order.
+
+    :param isl: the :class:`island.island`
+    :param species: 'herbivore' or 'carnivore'
+    :return columns: dictionary with an array for each of
+        :attr:`population.population_store.columns`
+    """
+    if isl.engine in ('array', 'tiled'):
+        if isl.engine == 'tiled':
+            store = isl._tiles.gather({species: isl.species[species]})[species]
+        else:
+            store = isl.herb if species == 'herbivore' else isl.carn
+        return {column: getattr(store, column) for column in store.columns}
+
+    attribute = 'herb' if species == 'herbivore' else 'carn'
+    columns = np.fromiter(((c, specie.weight, specie.age, specie.fitness, specie.migrated)
+                           for c in sorted(isl._active)
+                           for specie in getattr(isl.cells[c], attribute)),
+                          dtype=[('cell', np.intp), ('weight', float), ('age', np.int64),
+                                 ('fitness', float), ('migrated', bool)],
+                          count=isl._totals[species])
+    columns = {name: columns[name] for name in columns.dtype.names}
+    columns['origin'] = columns['cell'].copy()
+    columns['id'] = np.arange(len(columns['cell']))
+    return columns
+
+
+def island_arrays(isl):
+    """
+    Collects the state of an island.
+
+    :param isl: the :class:`island.island`
+    :return arrays: dictionary of named NumPy arrays
+    """
+    arrays = {'engine': np.array(isl.engine),
+              'map': np.array('\n'.join(''.join(row) for row in isl.landscape)),
+              'f_max': isl.f_max,
+              'f_max_override': isl.f_max_override,
+              'fodder': isl.fodder,
+              'landscape_params': text_array(isl.landscape_params),
+              'animal_params': text_array({name: cls.get_params()
+                                           for name, cls in isl.species.items()}),
+              'rng_state': text_array(isl._rng.bit_generator.state),
+              'random_source_state': text_array(isl.random_source.get_state()),
+              'stream_key': np.array(isl._streams.key),
+              'island_year': np.array(isl._year)}
+    for species in SPECIES:
+        for column, values in animal_arrays(isl, species).items():
+            arrays[species + '_' + column] = values
+    if isl.engine == 'array':
+        arrays['herbivore_next_id'] = np.array(isl.herb.next_id)
+        arrays['carnivore_next_id'] = np.array(isl.carn.next_id)
+    elif isl.engine == 'tiled':
+        for species, next_ids in isl._tiles.next_ids().items():
+            arrays[species + '_next_id'] = next_ids
+    return arrays
+
+
+def restore_island(isl, arrays):
+    """
+    Puts a state collected by :func:`island_arrays` into a new island with the same map
+    and engine, which must not have any animals yet.
+
+    :param isl: the :class:`island.island`
+    :param arrays: dictionary of named NumPy arrays
+    """
+    if str(arrays['engine']) != isl.engine:
+        raise ValueError('The checkpoint is for the ' + str(arrays['engine']) + ' engine')
+    if isl.animal_count() != 0:
+        raise ValueError('A checkpoint can only be restored on an island without animals')
+    isl.landscape_params = read_text(arrays['landscape_params'])
+    isl.f_max[:] = arrays['f_max']
+    if 'f_max_override' in arrays:
+        isl.f_max_override[:] = arrays['f_max_override']
+    isl.fodder[:] = arrays['fodder']
+    for name, params in read_text(arrays['animal_params']).items():
+        isl.species[name].update_params({param: value for param, value in params.items()
+                                         if value is not None})
+    isl._rng.bit_generator.state = read_text(arrays['rng_state'])
+    isl.random_source.set_state(read_text(arrays['random_source_state']))
+    isl._streams.key = np.uint64(arrays['stream_key'])
+    isl._year = int(arrays['island_year'])
+
+    columns = {species: {column: arrays[species + '_' + column]
+                         for column in population_store.columns} for species in SPECIES}
+    if isl.engine == 'array':
+        for species, store in (('herbivore', isl.herb), ('carnivore', isl.carn)):
+            for column, values in columns[species].items():
+                setattr(store, column, values.copy())
+            store.next_id = int(arrays[species + '_next_id'])
+    elif isl.engine == 'tiled':
+        isl._tiles.set_streams(isl._streams)
+        for species in SPECIES:
+            isl._tiles.merge(species, columns[species])
+        isl._tiles.set_next_ids({species: arrays.get(species + '_next_id',
+                                                     [columns[species]['id'].max(initial=-1) + 1])
+                                 for species in SPECIES})
+    else:
+        for species, attribute in (('herbivore', 'herb'), ('carnivore', 'carn')):
+            cls = isl.species[species]
+            animal = columns[species]
+            for c, weight, age, fitness, migrated in zip(
+                    animal['cell'].tolist(), animal['weight'].tolist(), animal['age'].tolist(),
+                    animal['fitness'].tolist(), animal['migrated'].tolist()):
+                specie = cls(weight, age)
+                specie.fitness = fitness
+                specie.migrated = migrated
+                getattr(isl.cells[c], attribute).append(specie)
+            isl._active.update(animal['cell'].tolist())
+        isl._recount(isl._active)
+        return
+    isl._set_counts(*(np.bincount(columns[species]['cell'], minlength=isl.f_max.size)
+                      for species in SPECIES))
+
+
+def save(path, arrays):
+    """
+    Writes named arrays to an uncompressed .npz file.
+
+    :param path: file name or open file
+    :param arrays: dictionary of named NumPy arrays
+    """
+    np.savez(path, **arrays)
+
+
+def load(path):
+    """
+    Reads the named arrays of a file written by :func:`save`.
+
+    :param path: file name or open file
+    :return arrays: dictionary of named NumPy arrays
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _match(previous_id, current_id):
+    """
+    Finds the animals of the previous checkpoint by their ids.
+
+    :return rows, found: the row of each current animal in the previous checkpoint,
+        and whether it was there.
+    """
+    if len(previous_id) == 0:
+        return np.zeros(len(current_id), dtype=np.intp), np.zeros(len(current_id), dtype=bool)
+    order = np.argsort(previous_id, kind='stable')
+    rows = order[np.minimum(np.searchsorted(previous_id[order], current_id), len(order) - 1)]
+    return rows, previous_id[rows] == current_id
+
+
+def _species_classes(arrays):
+    """
+    Makes species classes with the animal parameters of a state.
+
+    :return species: dictionary mapping species names to classes
+    """
+    species = {'herbivore': herbivore.copy_species(), 'carnivore': carnivore.copy_species()}
+    for name, params in read_text(arrays['animal_params']).items():
+        species[name].update_params({param: value for param, value in params.items()
+                                     if value is not None})
+    return species
+
+
+def _predict(previous, column, rows, found, years, current, cls):
+    """
+    Predicts the values of a column some years after the previous checkpoint,
+    for animals that neither ate, gave birth nor migrated:
+    older by the number of years, with the yearly weight loss,
+    and the fitness and origin following from the columns of the new state rebuilt so far.
+    Animals not in the previous checkpoint are predicted from zeros.
+
+    :param previous: the column in the previous checkpoint
+    :param column: name of the column
+    :param rows: the row of each animal in the previous checkpoint
+    :param found: True for the animals in the previous checkpoint
+    :param years: years between the checkpoints
+    :param current: dictionary with the columns of the new state rebuilt so far
+    :param cls: the species class with the parameters of the new state
+    """
+    if column == 'fitness':
+        return kernels.fitness(current['weight'], current['age'], cls)
+    if column == 'origin':
+        return current['cell'].copy()
+    values = np.zeros(len(rows), previous.dtype)
+    values[found] = previous[rows[found]]
+    if column == 'age':
+        return values + years
+    if column == 'weight':
+        for _ in range(years):
+            values = values - cls.eta * values
+    return values.copy()
+
+
+def delta_arrays(previous, current):
+    """
+    Encodes the state of an 'array' or 'tiled' engine island relative to an earlier state,
+    both collected by :func:`island_arrays`, matching the animals by their ids.
+
+    The ids of the animals are kept in order. Every other column is predicted from the
+    earlier state, see :func:`_predict`, and only the values differing from the prediction
+    are kept, with their positions in '<species>_<column>_changed',
+    or the whole column if most values differ.
+    So the newborns are the animals with new ids, the dead are the ids no longer there,
+    the migrations are the changed cells, with the source cell in the earlier state,
+    and weights are only kept for animals that ate or gave birth.
+    The fitness follows from the weight and age, and the origin from the cell,
+    so they are hardly ever kept.
+    Of the record, only the years added are kept, and the other arrays only if they changed.
+
+    :param previous: dictionary of named arrays of the earlier state
+    :param current: dictionary of named arrays of the new state
+    :return delta: dictionary of named arrays
+    """
+    delta = {}
+    for name, values in current.items():
+        if name.startswith('record_'):
+            delta[name] = values[len(previous[name]):]
+        elif name in _ANIMAL_NAMES:
+            continue
+        elif name not in previous or not np.array_equal(previous[name], values):
+            delta[name] = values
+    years = int(current['island_year']) - int(previous['island_year'])
+    classes = _species_classes(current)
+    for species in SPECIES:
+        ids = current[species + '_id']
+        rows, found = _match(previous[species + '_id'], ids)
+        delta[species + '_id'] = ids
+        columns = {column: current[species + '_' + column]
+                   for column in population_store.columns}
+        for column in population_store.columns:
+            if column == 'id':
+                continue
+            name = species + '_' + column
+            values = current[name]
+            predicted = _predict(previous[name], column, rows, found, years, columns,
+                                 classes[species])
+            changed = values != predicted
+            if 2 * np.count_nonzero(changed) > len(values):
+                delta[name] = values
+            else:
+                delta[name + '_changed'] = np.flatnonzero(changed)
+                delta[name] = values[changed]
+    return delta
+
+
+def apply_delta(previous, delta):
+    """
+    Rebuilds a state from an earlier state and a delta made by :func:`delta_arrays`.
+
+    :param previous: dictionary of named arrays of the earlier state
+    :param delta: dictionary of named arrays
+    :return arrays: dictionary of named arrays of the new state
+    """
+    arrays = {name: values for name, values in previous.items() if name not in _ANIMAL_NAMES}
+    for name, values in delta.items():
+        if name.startswith('record_'):
+            arrays[name] = np.concatenate((previous[name], values))
+        elif name not in _ANIMAL_NAMES and not name.endswith('_changed'):
+            arrays[name] = values
+    years = int(arrays['island_year']) - int(previous['island_year'])
+    classes = _species_classes(arrays)
+    for species in SPECIES:
+        ids = delta[species + '_id']
+        rows, found = _match(previous[species + '_id'], ids)
+        columns = {'id': ids}
+        for column in population_store.columns:
+            if column == 'id':
+                continue
+            name = species + '_' + column
+            if name + '_changed' in delta:
+                values = _predict(previous[name], column, rows, found, years, columns,
+                                  classes[species])
+                values[delta[name + '_changed']] = delta[name]
+            else:
+                values = delta[name]
+            columns[column] = values
+        for column, values in columns.items():
+            arrays[species + '_' + column] = values
+    return arrays
+
+
+class checkpoint_series:
+    """
+    Checkpoints of many years of a simulation in one directory.
+    A full checkpoint, base_<year>.npz, is written for the first year added and then
+    whenever base_years have passed since the last one, and for the other years only
+    a compressed delta from the year added before, delta_<year>.npz.
+    Deltas need the animal ids of the 'array' and 'tiled' engines. The animals of the
+    'object' engine have no ids, so a series of the 'object' engine holds only full
+    checkpoints, one for every year added.
+
+    :param directory: directory for the checkpoint files, made if missing
+    :param base_years: years between full checkpoints
+    """
+
+    def __init__(self, directory, base_years=10):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.base_years = base_years
+        self._previous = None
+        self._base_year = None
+
+    def _path(self, kind, year):
+        return os.path.join(self.directory, '{}_{:06d}.npz'.format(kind, year))
+
+    def _files(self):
+        """
+        :return files: dictionary mapping the years in the directory to 'base' or 'delta'
+        """
+        files = {}
+        for name in os.listdir(self.directory):
+            kind, _, rest = name.partition('_')
+            if kind in ('base', 'delta') and rest.endswith('.npz'):
+                files[int(rest[:-len('.npz')])] = kind
+        return files
+
+    def years(self):
+        """
+        :return years: sorted list of the years that can be loaded
+        """
+        return sorted(self._files())
+
+    def add(self, year, arrays):
+        """
+        Writes the checkpoint of a year, later than the years added before.
+
+        :param year: the year
+        :param arrays: dictionary of named arrays, as made by :func:`island_arrays`
+        """
+        if (self._previous is None or year - self._base_year >= self.base_years
+                or str(arrays['engine']) == 'object'):
+            save(self._path('base', year), arrays)
+            self._base_year = year
+        else:
+            np.savez_compressed(self._path('delta', year),
+                                **delta_arrays(self._previous, arrays))
+        self._previous = {name: np.array(values) for name, values in arrays.items()}
+
+    def load(self, year=None):
+        """
+        Rebuilds the checkpoint of a year from the nearest base before it and the deltas since.
+
+        :param year: the year, the last year written if None
+        :return arrays: dictionary of named arrays
+        """
+        files = self._files()
+        if year is None:
+            year = max(files)
+        if year not in files:
+            raise KeyError('No checkpoint for year {}'.format(year))
+        base = max(y for y, kind in files.items() if kind == 'base' and y <= year)
+        arrays = load(self._path('base', base))
+        for y in sorted(y for y in files if base < y <= year):
+            arrays = apply_delta(arrays, load(self._path('delta', y)))
+        return arrays
@@ -0,0 +1,192 @@
+"""
+:mod:`ensemble` runs replicates of the same simulation for many seeds in a process pool.
+
+Each replicate builds its own :class:`island.island` without graphics and records the
+number of animals per species after every year. The replicates are combined as they
+finish, into running means and variances over the seeds.
+"""
+
+import multiprocessing
+import random as rd
+import numpy as np
+from biosim.island import island
+
+SPECIES = ('Herbivore', 'Carnivore')
+
+
+class running_stats:
+    """
+    Mean and variance of a series of arrays, updated one array at a time
+    with Welford's online algorithm, so the arrays do not need to be kept.
+
+    :param shape: shape of the arrays to be added.
+    """
+
+    def __init__(self, shape):
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def update(self, values):
+        """
+        Adds one array to the statistics.
+
+        :param values: array of the shape given on creation.
+        """
+        self.n += 1
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self):
+        """
+        Sample variance of the arrays added so far, zero if fewer than two are added.
+        """
+        if self.n < 2:
+            return np.zeros_like(self._m2)
+        return self._m2 / (self.n - 1)
+
+
+class ensemble_result:
+    """
+    Results of :func:`run_ensemble`.
+
+    :param seeds: list of the seeds that were run.
+    :param num_years: number of years simulated for each seed.
+
+    :attr:`counts` maps each seed to an integer array of shape (num_years + 1, 2),
+    holding the number of animals per species in the order of :data:`SPECIES`,
+    at the start (row 0) and after every simulated year.
+    :attr:`stats` is a :class:`running_stats` over the count arrays of all seeds.
+    """
+
+    def __init__(self, seeds, num_years):
+        self.seeds = list(seeds)
+        self.species = SPECIES
+        self.counts = {}
+        self.stats = running_stats((num_years + 1, len(SPECIES)))
+
+    def add(self, seed, counts):
+        """
+        Adds the counts of one replicate.
+
+        :param seed: the seed of the replicate.
+        :param counts: integer array of species counts per year.
+        """
+        self.counts[seed] = counts
+        self.stats.update(counts)
+
+    @property
+    def mean(self):
+        """
+        Mean count per year and species over the seeds.
+        """
+        return self.stats.mean
+
+    @property
+    def variance(self):
+        """
+        Variance of the count per year and species over the seeds.
+        """
+        return self.stats.variance
+
+
+def run_replicate(island_map, ini_pop, seed, num_years, events=None, animal_params=None,
+                  landscape_params=None, engine='object', max_animals=None):
+    """
+    Runs one replicate of a simulation without graphics, seeded as :class:`biosim.BioSim` does.
+    Parameters are set before the population is added, so the initial fitness of the animals
+    follows the new parameters.
+
+    :param island_map: Multi-line string specifying island geography
+    :param ini_pop: List of dictionaries specifying initial population
+    :param seed: Integer used as random number seed
+    :param num_years: number of years to simulate
+    :param events: dictionary mapping a year to a population that is added
+        after that many years have been simulated, as with :func:`biosim.BioSim.add_population`
+    :param animal_params: dictionary mapping species names to parameter dictionaries
+    :param landscape_params: dictionary mapping landscape codes to parameter dictionaries
+    :param engine: 'object' or 'array', see :class:`island.island`
+    :param max_animals: if given, the replicate stops early once the total number of animals
+        exceeds it.
+    :return counts: integer array with the count of each species at the start and after
+        every year, with shape (num_years + 1, 2), or fewer rows if stopped by max_animals.
+        Once both species are extinct and no more animals are to be added,
+        the simulation stops and the remaining years are counted as zero.
+    """
+    events = {} if events is None else events
+    sim_island = island(island_map, engine=engine, seed=seed)
+    for species, params in (animal_params or {}).items():
+        sim_island.change_animalparams(species, params)
+    for landscape, params in (landscape_params or {}).items():
+        sim_island.change_landscapeparams(landscape, params)
+    sim_island.add_population(ini_pop)
+    rd.seed(a=seed)
+
+    counts = np.zeros((num_years + 1, len(SPECIES)), dtype=np.int64)
+    for year in range(num_years + 1):
+        if year > 0:
+            sim_island.sim_year()
+        species_count = sim_island.species_count()
+        counts[year] = [species_count[species] for species in SPECIES]
+        if year in events:
+            sim_island.add_population(events[year])
+        elif counts[year].sum() == 0 and all(event < year for event in events):
+            return counts
+        if max_animals is not None and counts[year].sum() > max_animals:
+            return counts[:year + 1]
+    return counts
+
+
+def _run_job(job):
+    """
+    Runs a replicate in a worker process.
+
+    :param job: tuple with the seed and the keyword arguments for :func:`run_replicate`.
+    :return seed, counts: the seed and the counts of the replicate.
+    """
+    seed, kwargs = job
+    return seed, run_replicate(seed=seed, **kwargs)
+
+
+def run_ensemble(island_map, ini_pop, seeds, num_years, events=None, animal_params=None,
+                 landscape_params=None, engine='object', processes=None):
+    """
+    Runs a replicate of the simulation for every seed in a pool of worker processes.
+    The counts of each replicate are added to the running statistics as soon as it finishes.
+
+    .. code-block:: python
+
+        result = run_ensemble(geogr, ini_herbs, seeds=range(100, 200), num_years=301,
+                              events={50: ini_carns})
+        result.mean[-1], result.variance[-1]
+
+    :param island_map: Multi-line string specifying island geography
+    :param ini_pop: List of dictionaries specifying initial population
+    :param seeds: sequence of integer seeds, one replicate is run for each
+    :param num_years: number of years to simulate
+    :param events: dictionary mapping a year to a population that is added
+        after that many years have been simulated
+    :param animal_params: dictionary mapping species names to parameter dictionaries
+    :param landscape_params: dictionary mapping landscape codes to parameter dictionaries
+    :param engine: 'object' or 'array', see :class:`island.island`
+    :param processes: number of worker processes, all cores if None.
+        With 1, the replicates run in the calling process.
+    :return result: :class:`ensemble_result` with the counts of every seed
+        and their running mean and variance.
+    """
+    kwargs = dict(island_map=island_map, ini_pop=ini_pop, num_years=num_years, events=events,
+                  animal_params=animal_params, landscape_params=landscape_params,
+                  engine=engine)
+    jobs = [(seed, kwargs) for seed in seeds]
+    result = ensemble_result(seeds, num_years)
+
+    if processes == 1:
+        for job in jobs:
+            result.add(*_run_job(job))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for seed, counts in pool.imap_unordered(_run_job, jobs):
+                result.add(seed, counts)
+    return result
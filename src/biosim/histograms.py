@@ -0,0 +1,71 @@
+"""
+:mod:`histograms` counts the animals into the histogram bins given by hist_specs.
+
+The weight, fitness and age of the animals of each species are fetched from the island
+in one pass, and each property is counted into its bins with one :func:`numpy.bincount`.
+"""
+
+import numpy as np
+
+PROPERTIES = ('weight', 'fitness', 'age')
+
+
+class histogram_collector:
+    """
+    Counts the animals of the island into histogram bins.
+
+    :param hist_specs: dictionary with the maximum value and the bin width for each property,
+        as given to :class:`biosim.BioSim`, e.g. {'weight': {'max': 80, 'delta': 2}}.
+        No histograms are made if None.
+
+    The bins of each property start at 0 and have width delta, up to max.
+    Values outside [0, max] are not counted, and max itself is counted in the last bin,
+    as with :func:`numpy.histogram`.
+    """
+
+    def __init__(self, hist_specs=None):
+        self.bins = {}
+        for prop, spec in (hist_specs or {}).items():
+            if prop not in PROPERTIES:
+                raise ValueError(prop + ' ' + 'Is an unrecognized histogram property')
+            self.bins[prop] = (spec['max'], int(round(spec['max'] / spec['delta'])))
+
+    def edges(self, prop):
+        """
+        :param prop: the property, one of :data:`PROPERTIES`
+        :return edges: array with the bin edges of the property
+        """
+        top, n_bins = self.bins[prop]
+        return np.linspace(0, top, num=n_bins + 1)
+
+    def count(self, values, prop):
+        """
+        Counts values into the bins of a property.
+
+        :param values: array of values
+        :param prop: the property, one of :data:`PROPERTIES`
+        :return counts: integer array with the count in each bin
+        """
+        top, n_bins = self.bins[prop]
+        values = np.asarray(values, dtype=float)
+        inside = (values >= 0) & (values <= top)
+        index = np.minimum((values[inside] * (n_bins / top)).astype(np.intp), n_bins - 1)
+        return np.bincount(index, minlength=n_bins)
+
+    def collect(self, isl):
+        """
+        Makes the histograms of every property for both species on an island.
+        The animals are only fetched if there are histograms to make.
+
+        :param isl: the :class:`island.island`
+        :return histograms: dictionary mapping 'herbivore' and 'carnivore' to dictionaries
+            with the counts per bin of each property.
+        """
+        histograms = {'herbivore': {}, 'carnivore': {}}
+        if len(self.bins) == 0:
+            return histograms
+        for species, counts in histograms.items():
+            columns = isl.animal_columns(species)
+            for prop in self.bins:
+                counts[prop] = self.count(columns[prop], prop)
+        return histograms
@@ -1,5 +1,14 @@
 import numpy as np
-from biosim.biome import water, highland, lowland, desert
+from functools import partial
+from biosim.animals import herbivore, carnivore
+from biosim.biome import biome, water, highland, lowland, desert
+from biosim import kernels
+from biosim.population import population_store
+from biosim.randomsource import random_source
+from biosim.streams import random_streams
+from biosim.tiles import tile_group
+
+_landscapes = {'W': water, 'H': highland, 'L': lowland, 'D': desert}
 
 
 class island:
@@ -10,9 +19,35 @@ class island:
 
     :param gmap: text-string consisting of letters H, L, D, W
         representing Highland, Lowland, Desert and Water.
+    :param engine: 'object' to keep every animal as an object in the cell lists,
+        'array' to keep the animals in :class:`population.population_store` stores,
+        or 'tiled' to split the island into bands of rows simulated by worker processes,
+        see :mod:`tiles`.
+    :param seed: Integer used as random number seed for the vectorized yearly functions.
+        The 'array' and 'tiled' engines draw from the counter-based streams of :mod:`streams`,
+        so they give the same results for the same seed, whatever the number of tiles.
+        The species copies of the island share a :class:`randomsource.random_source`
+        with the same seed, for the random decisions of the animal methods.
+    :param tiles: number of tiles and worker processes for the 'tiled' engine.
+    :param transport: transport between the tiles for the 'tiled' engine,
+        'queue', 'socket' or a transport object from :mod:`tiles`.
+
+    The landscape codes, the f_max of every cell and the current fodder are kept as
+    NumPy grids in :attr:`landscape`, :attr:`f_max` and :attr:`fodder`, and the cells read
+    and write their fodder in the fodder grid.
+    The cells given their own f_max by :func:`change_cellparams` are marked in
+    :attr:`f_max_override`, and keep it when the parameters of their landscape type change.
+    Every island owns its animal parameters, as copies of the species classes
+    made by :func:`animals.animal.copy_species`, and its landscape parameters,
+    so changing the parameters of one island does not affect another.
+    With the 'tiled' engine, the worker processes are stopped by :func:`close`.
+
+    The number of animals of each species per cell is kept in the integer grids of
+    :attr:`density`, and the totals per species in counters, both updated as animals are
+    added, born, die or migrate, so counting the animals does not walk the map.
     """
 
-    def __init__(self, gmap):
+    def __init__(self, gmap, engine='object', seed=None, tiles=2, transport='queue'):
 
         map_list = gmap.split()
         coord_map = []
@@ -54,29 +89,108 @@ class island:
             coord_map.append(line_list)
 
         self.coord_map = coord_map
-
-    @staticmethod
-    def change_landscapeparams(land, params):
+        self.shape = (len(coord_map), line_len)
+        self.cells = [cell for row in coord_map for cell in row]
+        self.landscape = np.array([list(line.upper()) for line in map_list])
+        self.landscape_params = {land: {'f_max': float(cls.f_max)}
+                                 for land, cls in _landscapes.items()}
+        self.f_max = np.zeros(self.shape)
+        for land, params in self.landscape_params.items():
+            self.f_max[self.landscape == land] = params['f_max']
+        self.f_max_override = np.zeros(self.shape, dtype=bool)
+        self.fodder = self.f_max.copy()
+        for c, cell in enumerate(self.cells):
+            cell.attach(self.fodder.reshape(-1), self.f_max.reshape(-1), c)
+        self.engine = engine
+        self.species = {'herbivore': herbivore.copy_species(),
+                        'carnivore': carnivore.copy_species()}
+        self.herb = None
+        self.carn = None
+        self._rng = np.random.default_rng(seed)
+        self._streams = random_streams(seed)
+        self.random_source = random_source(seed)
+        for species in self.species.values():
+            species._random = self.random_source
+        self._year = 0
+        self.habitable = np.array([cell.habitable for cell in self.cells])
+        self.neighbours = kernels.neighbour_table(self.habitable.reshape(self.shape))
+
+        self._active = set()
+        self.density = {'herbivore': np.zeros(self.shape, dtype=int),
+                        'carnivore': np.zeros(self.shape, dtype=int)}
+        self._flat_density = {species: grid.reshape(-1) for species, grid in self.density.items()}
+        self._totals = {'herbivore': 0, 'carnivore': 0}
+        self._pipeline = [self.update_fodder,
+                          partial(self._cell_phase, biome.grazing),
+                          partial(self._cell_phase, biome.breeding),
+                          self.migration,
+                          partial(self._cell_phase, biome.aging_and_death)]
+
+        if engine == 'array':
+            self.herb = population_store(self.species['herbivore'], self.shape)
+            self.carn = population_store(self.species['carnivore'], self.shape)
+        elif engine == 'tiled':
+            self._tiles = tile_group(self.shape, self.habitable, self.neighbours,
+                                     tiles, transport, self._streams)
+        elif engine != 'object':
+            raise ValueError(engine + ' ' + 'Is an unrecognized engine')
+
+    def change_landscapeparams(self, land, params):
         """
-        Changes the constant parameters of a given animal type.
-        Uses the function :func:`biome.biome.update_params`.
+        Changes the constant parameters of a given landscape type on this island.
+        The values are kept in the landscape parameters of the island,
+        and f_max is written straight into the f_max grid for all cells of the type,
+        except the cells with their own f_max from :func:`change_cellparams`.
 
         :param land: a text string representing the landscape type to be updated
         :param params: a dictionary of constant names to be updated,
             with values they are going to be set to as values.
 
         """
-        if land == 'H':
-            highland.update_params(params)
-        elif land == 'L':
-            lowland.update_params(params)
-        elif land == 'W':
+        if land == 'W':
             raise KeyError('Water parameter can not be changed')
         elif land == 'D':
             raise KeyError('Desert parameter can not be changed')
-        else:
+        elif land not in self.landscape_params:
             raise KeyError('unknown cell type specified')
 
+        for param in params.keys():
+            if param not in self.landscape_params[land]:
+                raise ValueError('Unknown parameter inserted')
+        self.landscape_params[land].update(params)
+        self.f_max[(self.landscape == land) & ~self.f_max_override] = \
+            self.landscape_params[land]['f_max']
+
+    def change_cellparams(self, loc, params):
+        """
+        Changes the parameters of a single cell, given in coordinates starting at (1,1),
+        overriding the values for its landscape type, now and after later changes
+        with :func:`change_landscapeparams`.
+
+        :param loc: a tuple with the coordinates of the cell
+        :param params: a dictionary of constant names to be updated,
+            with values they are going to be set to as values.
+        """
+        if loc[0] > 0 and loc[1] > 0:
+            y_value = loc[0] - 1
+            x_value = loc[1] - 1
+        else:
+            raise KeyError('Please use coordinate values larger than 0!')
+        if not self.coord_map[y_value][x_value].habitable:
+            raise KeyError('Water parameter can not be changed')
+
+        for param in params.keys():
+            if param != 'f_max':
+                raise ValueError('Unknown parameter inserted')
+        self.f_max[y_value, x_value] = params['f_max']
+        self.f_max_override[y_value, x_value] = True
+
+    def update_fodder(self):
+        """
+        Regrows the fodder in all cells for the new year, in one step over the fodder grid.
+        """
+        self.fodder[:] = self.f_max
+
     def species_count(self):
         """
         Counts the number of animal per species on the entire Island.
@@ -85,151 +199,245 @@ class island:
         """
 
         species_amount = {
-            'Carnivore': 0,
-            'Herbivore': 0
+            'Carnivore': self._totals['carnivore'],
+            'Herbivore': self._totals['herbivore']
         }
-        for lst in self.coord_map:
-
-            for x in lst:
-                species_amount['Carnivore'] += len(x.carn)
-                species_amount['Herbivore'] += len(x.herb)
-
         return species_amount
 
     def change_animalparams(self, species, params):
         """
-        Passes changes of animal parameters to the function :func:`biome.biome.change_animalparams`
+        Changes the animal parameters of a species on this island only.
+        Runs :func:`animals.animal.update_params` on the island's own copy of the species.
 
         :param species: String representing the species to update parameters for
         :param params: Dictionary with parameter names and new values
         """
-        self.coord_map[0][0].change_animalparams(species, params)
+        if species.lower() not in self.species:
+            raise KeyError('unknown species specified')
+        self.species[species.lower()].update_params(params)
 
     def animal_count(self):
         """
         Counts the number of animal per species on the entire Island.
 
-        :return animal_amount: a dictionary with the count of each the two species on the island.
+        :return animal_amount: the number of animals on the island.
         """
+        return self._totals['herbivore'] + self._totals['carnivore']
 
-        animal_amount = 0
-        for lst in self.coord_map:
+    def _recount(self, cells):
+        """
+        Updates the density grids and the counters for the given cells of the 'object' engine.
 
-            for x in lst:
-                animal_amount += len(x.carn)
-                animal_amount += len(x.herb)
+        :param cells: iterable of flat cell indices.
+        """
+        herb = self._flat_density['herbivore']
+        carn = self._flat_density['carnivore']
+        for c in cells:
+            n_herb = len(self.cells[c].herb)
+            n_carn = len(self.cells[c].carn)
+            self._totals['herbivore'] += n_herb - int(herb[c])
+            self._totals['carnivore'] += n_carn - int(carn[c])
+            herb[c] = n_herb
+            carn[c] = n_carn
+
+    def _set_counts(self, herb, carn):
+        """
+        Replaces the density grids and the counters with new counts per cell,
+        for the 'array' and 'tiled' engines.
 
-        return animal_amount
+        :param herb: integer array with the number of herbivores per flat cell index.
+        :param carn: integer array with the number of carnivores per flat cell index.
+        """
+        for species, counts in (('herbivore', herb), ('carnivore', carn)):
+            self._flat_density[species][:] = counts
+            self._totals[species] = int(self._flat_density[species].sum())
 
     def sim_year(self):
         """
         Goes through a yearly simulation, and executes the yearly function in sequence.
+        The yearly functions are bound once when the island is made,
+        and only the occupied land cells are visited.
         """
-        yearly_functions = ['update_fodder', 'grazing', 'breeding',
-                            'migration', 'aging', 'remove_population']
+        if self.engine == 'array':
+            self._sim_year_array()
+            return
+        if self.engine == 'tiled':
+            self._year += 1
+            self._set_counts(*self._tiles.sim_year(
+                self._year, self.f_max.reshape(-1),
+                {name: cls.get_params() for name, cls in self.species.items()}))
+            return
+
+        self._year += 1
+        for phase in self._pipeline:
+            phase()
+
+    def _cell_phase(self, func):
+        """
+        Runs a yearly function of :class:`biome.biome` for every occupied cell,
+        and afterwards drops the cells left without animals from the occupied cells.
 
-        for func in yearly_functions:
-            if func == 'migration':
-                self.migration()
-            else:
-                for lst in self.coord_map:
+        :param func: the function to run, taking the cell and the random generator
+            of the island as arguments.
+        """
+        for c in sorted(self._active):
+            func(self.cells[c], self._rng)
+        self._recount(self._active)
+        self._active = {c for c in self._active
+                        if len(self.cells[c].herb) + len(self.cells[c].carn) > 0}
 
-                    for x in lst:
-                        if len(x.herb) + len(x.carn) > 0:
-                            exec("x.%s()" % func)
+    def _sim_year_array(self):
+        """
+        Goes through a yearly simulation with the 'array' engine,
+        running the yearly functions of :class:`population.population_store` in sequence,
+        each with the streams of its phase of the year.
+        """
+        self._year += 1
+        phase = partial(self._streams.phase, self._year)
+        self.update_fodder()
+        stores = (('herbivore', self.herb), ('carnivore', self.carn))
+        self.herb.grazing(self.fodder.reshape(-1), phase('grazing', 'herbivore'))
+        self.carn.hunting(self.herb, phase('hunting', 'carnivore'))
+        for name, store in stores:
+            store.breeding(phase('breeding', name))
+        for name, store in stores:
+            store.migration(self.neighbours, phase('migration', name))
+        for name, store in stores:
+            store.aging_death(phase('aging_death', name))
+        self._set_counts(self.herb.counts(), self.carn.counts())
 
     def migration(self):
         """
-        Runs the :func:`biome.biome.migration` function for all cells on the island,
-        providing the neighbouring cells for each.
+        Runs the yearly migration for all animals on the island in one step per species.
+        The animals of all cells are collected, :func:`kernels.migration` decides who moves
+        where using the neighbour table made once for the map,
+        and the movers are then taken out of their cells and added to their new cells.
         """
 
-        for y in range(len(self.coord_map) - 1):
-
-            for x in range(len(self.coord_map[y]) - 1):
-                cur_cell = self.coord_map[y][x]
-                neighbours = []
-                try:
-                    neighbours = [self.coord_map[y][x-1], self.coord_map[y-1][x],
-                                  self.coord_map[y][x+1], self.coord_map[y+1][x]]
-                except IndexError:
-                    pass
-                if len(neighbours) > 0:
-                    cur_cell.migration(neighbours)
+        for species in ('herb', 'carn'):
+            animals = []
+            cells = []
+            for c in sorted(self._active):
+                animals.extend(getattr(self.cells[c], species))
+                cells.extend([c] * len(getattr(self.cells[c], species)))
+            if len(animals) == 0:
+                continue
+
+            cells = np.array(cells)
+            movers, target = kernels.migration(
+                cells, np.array([specie.fitness for specie in animals], dtype=float),
+                np.array([specie.migrated for specie in animals], dtype=bool),
+                type(animals[0]), self.neighbours, self._rng)
+
+            moved = np.zeros(len(animals), dtype=bool)
+            moved[movers] = True
+            for c in np.unique(cells[movers]).tolist():
+                start, end = np.searchsorted(cells, [c, c + 1])
+                getattr(self.cells[c], species)[:] = [animals[i] for i in range(start, end)
+                                                      if not moved[i]]
+            for i, c in zip(movers.tolist(), target.tolist()):
+                animals[i].migrated = True
+                getattr(self.cells[c], species).append(animals[i])
+            self._active.update(target.tolist())
+            self._recount(set(cells[movers].tolist()) | set(target.tolist()))
+        self._active = {c for c in self._active
+                        if len(self.cells[c].herb) + len(self.cells[c].carn) > 0}
 
     def add_population(self, populations):
         """
         Adds animals to a given cell, given in coordinates starting at (1,1).
-        Runs the :func:`biome.biome.add_population` function for the desired cell.
+        Runs the :func:`biome.biome.add_population` function for the desired cell,
+        which is then counted among the occupied cells.
+        Animals can only be placed in habitable cells.
 
         :param populations: a list with a dictionary specifying the location of the animals,
         """
 
+        cells = []
         for population in populations:
             if population['loc'][0] > 0 and population['loc'][1] > 0:
                 y_value = population['loc'][0] - 1
                 x_value = population['loc'][1] - 1
             else:
                 raise KeyError('Please use coordinate values larger than 0!')
+            if not self.coord_map[y_value][x_value].habitable:
+                raise ValueError('Animals can not be placed in water cells!')
+            cells.append(y_value * self.shape[1] + x_value)
+
+        if self.engine in ('array', 'tiled'):
+            self._add_population_stores(cells, [population['pop'] for population in populations])
+            return
+        for cell, population in zip(cells, populations):
             pop = population['pop']
+            self.cells[cell].add_population(pop, self.species)
+            if len(pop) > 0:
+                self._active.add(cell)
+            self._recount([cell])
 
-            self.coord_map[y_value][x_value].add_population(pop)
-
-    def distrubution(self):
+    def _add_population_stores(self, cells, pops):
         """
-        Counts the number of animal per species on the entire Island.
+        Adds animals to the population stores of the 'array' engine, or sends them to the
+        tiles owning their cells for the 'tiled' engine.
+        The animals of all cells are added at once, so the stores are sorted once per species.
 
-        :return herbdist: a nested list representing the amount of herbivores per cell.
-        :return carndist: a nested list representing the amount of carnivores per cell.
+        :param cells: flat indices of the cells the animals are placed in.
+        :param pops: List with a list of dictionaries for each cell
         """
+        for species in ('herbivore', 'carnivore'):
+            animals = [(cell, specie) for cell, pop in zip(cells, pops) for specie in pop
+                       if specie['species'].lower() == species]
+            if len(animals) == 0:
+                continue
+            animal_cells = np.array([cell for cell, _ in animals], dtype=np.intp)
+            weights = [specie['weight'] for _, specie in animals]
+            ages = [specie['age'] for _, specie in animals]
+            if self.engine == 'tiled':
+                self._tiles.add(species, animal_cells, weights, ages)
+            else:
+                store = self.herb if species == 'herbivore' else self.carn
+                store.add(animal_cells, weights, ages)
+            self._flat_density[species] += np.bincount(animal_cells, minlength=len(self.cells))
+            self._totals[species] += len(animals)
 
-        herbdist = []
-        carndist = []
-
-        for row in self.coord_map:
-            yherb = []
-            ycarn = []
-
-            for cell in row:
-                yherb.append(len(cell.herb))
-                ycarn.append(len(cell.carn))
-
-            herbdist.append(yherb)
-            carndist.append(ycarn)
-
-        return herbdist, carndist
-
-    def get_bincounts(self):
+    def close(self):
+        """
+        Stops the worker processes of the 'tiled' engine. Does nothing for the other engines.
         """
-        Fetches information for the histograms.
+        if self.engine == 'tiled':
+            self._tiles.close()
 
-        :return 6 x 2d-arrays: representing weight, fitness and age for the animals in the cells.
+    def distrubution(self):
         """
-        herbweights = []
-        carnweights = []
-        herbfitness = []
-        carnfitness = []
-        herbage = []
-        carnage = []
+        Fetches the number of animals per species in every cell of the Island.
+        The grids of :attr:`density` are returned as they are, without copying,
+        so they change as the simulation goes on.
 
-        for row in self.coord_map:
-            for cell in row:
-                if len(cell.herb) > 0:
-                    herbweights.append(np.array([int(animal.weight) for animal in cell.herb],
-                                                dtype=object))
-                    herbfitness.append(np.array([round(animal.fitness, 1) for animal in cell.herb],
-                                                dtype=object))
-                    herbage.append(np.array([int(animal.age) for animal in cell.herb],
-                                            dtype=object))
+        :return herbdist: a 2d integer array with the amount of herbivores per cell.
+        :return carndist: a 2d integer array with the amount of carnivores per cell.
+        """
+        return self.density['herbivore'], self.density['carnivore']
 
-                if len(cell.herb) > 0:
-                    carnweights.append(np.array([int(animal.weight) for animal in cell.carn],
-                                                dtype=object))
-                    carnfitness.append(np.array([round(animal.fitness, 1) for animal in cell.carn],
-                                                dtype=object))
-                    carnage.append(np.array([int(animal.age) for animal in cell.carn],
-                                            dtype=object))
+    def animal_columns(self, species):
+        """
+        Fetches the weight, fitness and age of all animals of a species,
+        e.g. for :class:`histograms.histogram_collector`.
+        With the 'object' engine, the animals of the occupied cells are read in one pass,
+        and with the 'tiled' engine, only the animals of the species are sent by the tiles.
 
-        return np.array(herbweights, dtype=object), np.array(carnweights, dtype=object), \
-            np.array(herbfitness, dtype=object), np.array(carnfitness, dtype=object), \
-            np.array(herbage, dtype=object), np.array(carnage, dtype=object)
+        :param species: 'herbivore' or 'carnivore'
+        :return columns: dictionary with an array for each of 'weight', 'fitness' and 'age'.
+        """
+        if self.engine in ('array', 'tiled'):
+            if self.engine == 'tiled':
+                store = self._tiles.gather({species: self.species[species]})[species]
+            else:
+                store = self.herb if species == 'herbivore' else self.carn
+            return {'weight': store.weight, 'fitness': store.fitness, 'age': store.age}
+
+        attribute = 'herb' if species == 'herbivore' else 'carn'
+        columns = np.fromiter(((specie.weight, specie.fitness, specie.age)
+                               for c in sorted(self._active)
+                               for specie in getattr(self.cells[c], attribute)),
+                              dtype=[('weight', float), ('fitness', float), ('age', float)],
+                              count=self._totals[species])
+        return {name: columns[name] for name in ('weight', 'fitness', 'age')}
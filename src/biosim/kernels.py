@@ -0,0 +1,190 @@
+"""
+:mod:`kernels` holds the vectorized yearly functions shared by the two engines.
+Each kernel works on NumPy arrays with one entry per animal, and reads the constant
+parameters from the animal class given as species.
+Apart from :func:`hunting`, every call to the random generator draws one number per animal,
+so the kernels can also use the per-animal streams of :class:`streams.animal_stream`.
+"""
+
+import numpy as np
+
+
+def fitness(weight, age, species):
+    """
+    Vectorized version of :func:`animals.animal.fitness_update`.
+
+    :param weight: array of animal weights
+    :param age: array of animal ages
+    :param species: the animal class holding the parameters
+    :return fitness: array of fitness values between 0 and 1
+    """
+    with np.errstate(over='ignore'):
+        phi = (1 / (1 + np.exp(species.phi_age * (age - species.a_half)))) * \
+              (1 / (1 + np.exp(-species.phi_weight * (weight - species.w_half))))
+    return np.where(weight > 0, phi, 0)
+
+
+def aging_death(weight, age, species, rng):
+    """
+    Runs the yearly aging and death for a group of animals in one step.
+    The age is increased, the yearly weight loss subtracted and fitness recalculated,
+    as :func:`animals.animal.aging` does.
+    Death is then decided with the new fitness, as :func:`animals.animal.death` does.
+
+    :param weight: array of animal weights
+    :param age: array of animal ages
+    :param species: the animal class holding the parameters
+    :param rng: NumPy random generator
+    :return weight, age, fitness, alive: the updated arrays, and a boolean array
+        which is True for the animals that survive.
+    """
+    age = age + 1
+    weight = weight - species.eta * weight
+    phi = fitness(weight, age, species)
+    alive = (weight > 0) & (rng.random(len(weight)) > species.omega * (1 - phi))
+    return weight, age, phi, alive
+
+
+def grazing(cell, fodder, species, rng):
+    """
+    Simulates the herbivores eating the fodder of their cells,
+    as :func:`animals.herbivore.feeding` does for each herbivore.
+    The herbivores of each cell eat in random order, drawn from rng.
+    In that order, the cumulative sum of the appetites F is compared to the fodder
+    of the cell, so the first herbivores eat fully, at most one eats what is left,
+    and the rest get nothing.
+
+    :param cell: array with the cell index of each herbivore
+    :param fodder: array with the available fodder, indexed by cell
+    :param species: the herbivore class holding the parameters
+    :param rng: NumPy random generator
+    :return eaten, fodder: array with the fodder eaten by each herbivore,
+        and array with the fodder left in each cell.
+    """
+    order = np.lexsort((rng.random(len(cell)), cell))
+    counts = np.bincount(cell, minlength=len(fodder))
+    starts = np.cumsum(counts) - counts
+    eaten_before = species.F * (np.arange(len(cell)) - starts[cell[order]])
+    eaten = np.empty(len(cell))
+    eaten[order] = np.clip(fodder[cell[order]] - eaten_before, 0, species.F)
+    return eaten, np.maximum(fodder - species.F * counts, 0)
+
+
+def breeding(weight, fitness, n_animals, species, rng):
+    """
+    Decides the yearly births for a group of animals in one step,
+    as :func:`animals.animal.birth` does for each animal.
+    Animals weighing less than zeta times the birth weight plus its standard deviation,
+    or living in a cell with fewer than two animals of the species, will not give birth.
+
+    :param weight: array of animal weights
+    :param fitness: array of animal fitness
+    :param n_animals: number of animals of the species in the cell of each animal,
+        as an array or a single integer
+    :param species: the animal class holding the parameters
+    :param rng: NumPy random generator
+    :return mothers, newborn: indices of the animals giving birth, and the newborn weights
+    """
+    n_animals = np.broadcast_to(n_animals, np.shape(weight))
+    eligible = np.flatnonzero((weight > species.zeta * (species.w_birth + species.sigma_birth))
+                              & (n_animals >= 2))
+    birth_proba = np.minimum(1, species.gamma * fitness[eligible] * (n_animals[eligible] - 1))
+    mothers = eligible[rng.random(len(weight))[eligible] <= birth_proba]
+    newborn = rng.normal(species.w_birth, species.sigma_birth, len(weight))[mothers]
+    viable = (newborn > 0) & (species.xi * newborn < weight[mothers])
+    return mothers[viable], newborn[viable]
+
+
+def hunting(hunter_weight, hunter_fitness, prey_weight, prey_fitness, species, rng):
+    """
+    Simulates the carnivores of one cell hunting the herbivores of the same cell,
+    as :func:`animals.carnivore.feeding` does for each carnivore.
+    The carnivores hunt in order of descending fitness, and each tries the living herbivores
+    in order of ascending fitness.
+    The herbivores are sorted once, and eaten ones are marked in a mask instead of being
+    removed from a list.
+    A carnivore stops hunting as soon as its appetite F is met, or when no living herbivore
+    is weaker than itself.
+    The random draws for the candidates are made in blocks of growing size,
+    so few numbers are drawn beyond the point where the appetite is met.
+
+    :param hunter_weight: array of carnivore weights
+    :param hunter_fitness: array of carnivore fitness
+    :param prey_weight: array of herbivore weights
+    :param prey_fitness: array of herbivore fitness
+    :param species: the carnivore class holding the parameters
+    :param rng: NumPy random generator
+    :return weight, alive: the new carnivore weights, and a boolean array which is True
+        for the herbivores that survive, both in the order they were given.
+    """
+    order = np.argsort(prey_fitness, kind='stable')
+    sorted_fitness = prey_fitness[order]
+    sorted_weight = prey_weight[order]
+    alive = np.ones(len(order), dtype=bool)
+    weight = np.array(hunter_weight, dtype=float)
+
+    for k in np.argsort(-hunter_fitness, kind='stable'):
+        weaker = np.searchsorted(sorted_fitness, hunter_fitness[k], side='left')
+        candidates = np.flatnonzero(alive[:weaker])
+        appetite = species.F
+        start = 0
+        block = 16
+        while appetite > 0 and start < len(candidates):
+            chunk = candidates[start:start + block]
+            p_eat = np.minimum(1, (hunter_fitness[k] - sorted_fitness[chunk]) /
+                               species.DeltaPhiMax)
+            eaten = chunk[rng.random(len(chunk)) <= p_eat]
+            meals = np.cumsum(sorted_weight[eaten])
+            n_eaten = min(len(eaten), np.searchsorted(meals, appetite, side='left') + 1)
+            if n_eaten > 0:
+                alive[eaten[:n_eaten]] = False
+                weight[k] += species.beta * meals[n_eaten - 1]
+                appetite -= meals[n_eaten - 1]
+            start += block
+            block *= 2
+
+    survivors = np.empty_like(alive)
+    survivors[order] = alive
+    return weight, survivors
+
+
+def migration(cell, fitness, migrated, species, neighbours, rng):
+    """
+    Decides the yearly migration for a group of animals in one step,
+    as :func:`animals.animal.migration` does for each animal.
+    Every animal that has not already migrated this year migrates with probability
+    mu times its fitness, and picks one of its four neighbouring cells at random.
+    The move only happens if that neighbour is habitable.
+
+    :param cell: array with the cell index of each animal
+    :param fitness: array of animal fitness
+    :param migrated: boolean array, True for animals that have already migrated this year
+    :param species: the animal class holding the parameters
+    :param neighbours: integer array with one row of four neighbour indices per cell,
+        as made by :func:`neighbour_table`
+    :param rng: NumPy random generator
+    :return movers, target: indices of the animals that move, and the cells they move to
+    """
+    wants = (rng.random(len(cell)) <= species.mu * fitness) & ~migrated
+    movers = np.flatnonzero(wants)
+    target = neighbours[cell[movers], rng.integers(0, 4, len(cell))[movers]]
+    return movers[target >= 0], target[target >= 0]
+
+
+def neighbour_table(habitable):
+    """
+    Makes the table of neighbouring cells used by :func:`migration`.
+    The neighbours of each cell are given in the order left, up, right, down,
+    as flat cell indices.
+    Neighbours outside the map or not habitable are given as -1.
+
+    :param habitable: 2d boolean array, True for the habitable cells of the map
+    :return neighbours: integer array with one row of four neighbour indices per cell
+    """
+    n_rows, n_cols = habitable.shape
+    rows, cols = np.divmod(np.arange(n_rows * n_cols), n_cols)
+    rows = rows[:, np.newaxis] + np.array([0, -1, 0, 1])
+    cols = cols[:, np.newaxis] + np.array([-1, 0, 1, 0])
+    inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+    target = np.where(inside, rows * n_cols + cols, 0)
+    return np.where(inside & habitable.ravel()[target], target, -1)
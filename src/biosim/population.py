@@ -0,0 +1,226 @@
+import numpy as np
+from biosim import kernels
+from biosim.streams import phase_stream
+
+
+class population_store:
+    """
+    Structure-of-arrays store for all animals of one species on the island.
+    Instead of one Python object per animal, the weight, age, fitness and migration flag
+    of every animal are kept in contiguous NumPy arrays, together with the flat index of
+    the cell the animal lives in.
+    The arrays are kept sorted by cell index, so the animals of one cell form a contiguous
+    slice, in the same order as they would appear in :attr:`biome.biome.herb`
+    or :attr:`biome.biome.carn`.
+    After the migration, the animals of a cell are ordered by the cell they came from,
+    kept in :attr:`origin`, so the order does not depend on how the island is split into tiles.
+    Every animal added or born gets the next number of :attr:`next_id` in :attr:`id`,
+    which follows the animal through the years, e.g. for :mod:`checkpoint` deltas.
+    The ids go up by :attr:`id_step`, so the stores of the tiles of an island
+    can each take every n-th id, starting at their own tile number.
+
+    Every yearly function takes rng, which is either a NumPy random generator
+    or a :class:`streams.phase_stream` giving every animal and cell its own stream.
+
+    :param species: the animal class, :class:`animals.herbivore` or :class:`animals.carnivore`,
+        holding the parameters for the species.
+    :param shape: tuple with the number of rows and columns of the island.
+    """
+
+    columns = ('cell', 'weight', 'age', 'fitness', 'migrated', 'origin', 'id')
+
+    def __init__(self, species, shape):
+        self.species = species
+        self.shape = shape
+        self.n_cells = shape[0] * shape[1]
+        self.cell = np.empty(0, dtype=np.intp)
+        self.weight = np.empty(0)
+        self.age = np.empty(0, dtype=np.int64)
+        self.fitness = np.empty(0)
+        self.migrated = np.empty(0, dtype=bool)
+        self.origin = np.empty(0, dtype=np.intp)
+        self.id = np.empty(0, dtype=np.int64)
+        self.next_id = 0
+        self.id_step = 1
+
+    def __len__(self):
+        return len(self.cell)
+
+    def add(self, cells, weights, ages):
+        """
+        Adds animals to the store, keeping the arrays sorted by cell.
+        New animals are placed after the animals already living in the same cell.
+
+        :param cells: sequence of flat cell indices for the new animals
+        :param weights: sequence of weights for the new animals
+        :param ages: sequence of ages for the new animals
+        """
+        n_old = len(self)
+        self.cell = np.concatenate((self.cell, np.asarray(cells, dtype=np.intp)))
+        self.weight = np.concatenate((self.weight, np.asarray(weights, dtype=float)))
+        self.age = np.concatenate((self.age, np.asarray(ages, dtype=np.int64)))
+        self.fitness = np.concatenate((self.fitness, np.zeros(len(self) - n_old)))
+        self.migrated = np.concatenate((self.migrated, np.zeros(len(self) - n_old, dtype=bool)))
+        self.origin = np.concatenate((self.origin, np.asarray(cells, dtype=np.intp)))
+        n_new = len(self) - n_old
+        self.id = np.concatenate((self.id, self.next_id + self.id_step * np.arange(n_new)))
+        self.next_id += self.id_step * n_new
+        self.fitness_update(slice(n_old, None))
+        self._sort()
+
+    def keep(self, mask):
+        """
+        Compacts the store, keeping only the animals where mask is True.
+
+        :param mask: boolean array with one entry per animal
+        """
+        for column in self.columns:
+            setattr(self, column, getattr(self, column)[mask])
+
+    def split(self, mask):
+        """
+        Takes the animals where mask is True out of the store.
+
+        :param mask: boolean array with one entry per animal
+        :return columns: dictionary with an array for each of :attr:`columns`,
+            holding the animals taken out.
+        """
+        columns = {column: getattr(self, column)[mask] for column in self.columns}
+        self.keep(~mask)
+        return columns
+
+    def merge(self, columns):
+        """
+        Puts animals taken out with :func:`split` into the store,
+        keeping their fitness and migration flags.
+
+        :param columns: dictionary with an array for each of :attr:`columns`
+        """
+        for column in self.columns:
+            setattr(self, column, np.concatenate((getattr(self, column), columns[column])))
+        self._sort()
+
+    def _sort(self):
+        """
+        Restores the ordering by cell and origin,
+        keeping the relative order of animals with the same cell and origin.
+        """
+        order = np.lexsort((self.origin, self.cell))
+        self.keep(order)
+
+    def counts(self):
+        """
+        Counts the animals in every cell.
+
+        :return counts: integer array with the number of animals per flat cell index.
+        """
+        return np.bincount(self.cell, minlength=self.n_cells)
+
+    def offsets(self):
+        """
+        Finds where the slice of each cell starts and ends in the store.
+
+        :return starts, ends: integer arrays indexed by flat cell index.
+        """
+        ends = np.cumsum(self.counts())
+        return ends - self.counts(), ends
+
+    def fitness_update(self, idx=slice(None)):
+        """
+        Recalculates the fitness for the selected animals,
+        using the same formula as :func:`animals.animal.fitness_update`.
+
+        :param idx: index, slice or mask selecting the animals to update.
+        """
+        self.fitness[idx] = kernels.fitness(self.weight[idx], self.age[idx], self.species)
+
+    def grazing(self, fodder, rng):
+        """
+        Lets the herbivores on the whole island eat from the fodder of their cells
+        with :func:`kernels.grazing`, and updates the weight and fitness of those that ate.
+
+        :param fodder: flat array with the fodder of every cell, updated in place.
+        :param rng: NumPy random generator or :class:`streams.phase_stream`.
+        """
+        eaten, fodder[:] = kernels.grazing(self.cell, fodder, self.species,
+                                           _animal_rng(rng, self.cell))
+        self.weight += self.species.beta * eaten
+        self.fitness_update(eaten > 0)
+
+    def hunting(self, prey, rng):
+        """
+        Lets the carnivores in every cell hunt the herbivores of the same cell,
+        running :func:`kernels.hunting` on the slices of each cell where both species live.
+
+        :param prey: the :class:`population_store` of herbivores.
+        :param rng: NumPy random generator or :class:`streams.phase_stream`.
+        """
+        c_starts, c_ends = self.offsets()
+        h_starts, h_ends = prey.offsets()
+        alive = np.ones(len(prey), dtype=bool)
+        occupied = (c_ends > c_starts) & (h_ends > h_starts)
+        for c in np.flatnonzero(occupied):
+            hunters = slice(c_starts[c], c_ends[c])
+            victims = slice(h_starts[c], h_ends[c])
+            self.weight[hunters], alive[victims] = kernels.hunting(
+                self.weight[hunters], self.fitness[hunters],
+                prey.weight[victims], prey.fitness[victims], self.species,
+                rng.cell(c) if isinstance(rng, phase_stream) else rng)
+            self.fitness_update(hunters)
+        prey.keep(alive)
+
+    def breeding(self, rng):
+        """
+        Simulates the yearly births for the species with :func:`kernels.breeding`,
+        counting the animals of the species in each mother's cell.
+        The weight loss is subtracted from the mothers, their fitness is updated,
+        and the newborns are placed after the other animals of their cell.
+
+        :param rng: NumPy random generator or :class:`streams.phase_stream`.
+        """
+        mothers, newborn = kernels.breeding(self.weight, self.fitness, self.counts()[self.cell],
+                                            self.species, _animal_rng(rng, self.cell))
+        self.weight[mothers] -= self.species.xi * newborn
+        self.fitness_update(mothers)
+        self.add(self.cell[mothers], newborn, np.zeros(len(mothers)))
+
+    def migration(self, neighbours, rng):
+        """
+        Simulates the yearly migration for the species with :func:`kernels.migration`,
+        moving all migrating animals to their new cells in one step.
+
+        :param neighbours: neighbour table of the island, see :func:`kernels.neighbour_table`.
+        :param rng: NumPy random generator or :class:`streams.phase_stream`.
+        """
+        movers, target = kernels.migration(self.cell, self.fitness, self.migrated,
+                                           self.species, neighbours,
+                                           _animal_rng(rng, self.cell))
+        self.cell[movers] = target
+        self.migrated[movers] = True
+        self._sort()
+
+    def aging_death(self, rng):
+        """
+        Runs the yearly aging and death for all animals of the species in one step,
+        using :func:`kernels.aging_death`, and removes the dead animals from the store.
+
+        :param rng: NumPy random generator or :class:`streams.phase_stream`.
+        """
+        self.weight, self.age, self.fitness, alive = kernels.aging_death(
+            self.weight, self.age, self.species, _animal_rng(rng, self.cell))
+        self.migrated[:] = False
+        self.origin = self.cell.copy()
+        self.keep(alive)
+
+
+def _animal_rng(rng, cell):
+    """
+    Picks the random generator for a kernel working on all animals of a store.
+
+    :param rng: NumPy random generator or :class:`streams.phase_stream`
+    :param cell: the cell array of the store
+    :return rng: the generator, or the :class:`streams.animal_stream` for the animals.
+    """
+    if isinstance(rng, phase_stream):
+        return rng.animals(cell)
+    return rng
@@ -0,0 +1,115 @@
+"""
+:mod:`randomsource` gives the animal methods their random numbers from NumPy blocks.
+
+Drawing one number at a time from :mod:`random` costs a Python function call per decision.
+A :class:`random_source` instead makes uniform and standard normal numbers in large blocks
+with a NumPy generator, and hands them out one at a time through the ``__next__`` of an
+iterator over the block, which costs far less than a call to :func:`random.uniform`.
+A new block is made only when the previous one is used up.
+"""
+
+import itertools
+import operator
+import numpy as np
+
+
+class _block_stream:
+    """
+    One buffered stream of numbers, drawn in blocks with a method of a NumPy generator.
+
+    :param rng: NumPy random generator
+    :param method: name of the generator method making a block, e.g. 'random'
+    :param block: number of values in a block
+    """
+
+    def __init__(self, rng, method, block):
+        self._rng = rng
+        self._draw = getattr(rng, method)
+        self.block = block
+        self._block_state = None
+        self._current = iter(())
+        self.next = itertools.chain.from_iterable(self._blocks()).__next__
+
+    def _blocks(self):
+        """
+        Makes the blocks, noting the generator state each block was made from.
+        """
+        while True:
+            self._block_state = self._rng.bit_generator.state
+            self._current = iter(self._draw(self.block).tolist())
+            yield self._current
+
+    def get_state(self):
+        """
+        :return state: dictionary with the generator state of the current block,
+            and the number of values used from it.
+        """
+        if self._block_state is None:
+            return {'state': self._rng.bit_generator.state, 'used': 0}
+        return {'state': self._block_state,
+                'used': self.block - operator.length_hint(self._current)}
+
+    def set_state(self, state):
+        """
+        Moves the stream to a position from :func:`get_state`,
+        by making the block again and skipping the values already used.
+        """
+        self._rng.bit_generator.state = state['state']
+        self._block_state = state['state']
+        self._current = iter(self._draw(self.block).tolist()[state['used']:])
+        self.next = itertools.chain(self._current,
+                                    itertools.chain.from_iterable(self._blocks())).__next__
+
+
+class random_source:
+    """
+    Block-buffered random numbers for the methods of :class:`animals.animal`.
+    The uniform and normal numbers come from two independent generators,
+    spawned from the seed.
+
+    :param seed: Integer used as random number seed
+    :param block: number of values made at a time
+
+    :attr:`uniform` and :attr:`normal` are called without arguments,
+    and return the next number uniform on [0, 1) and the next standard normal number.
+    """
+
+    def __init__(self, seed=None, block=4096):
+        uniform_seed, normal_seed = np.random.SeedSequence(seed).spawn(2)
+        self._streams = {
+            'uniform': _block_stream(np.random.default_rng(uniform_seed), 'random', block),
+            'normal': _block_stream(np.random.default_rng(normal_seed), 'standard_normal',
+                                    block)}
+        self._bind()
+
+    def _bind(self):
+        self.uniform = self._streams['uniform'].next
+        self.normal = self._streams['normal'].next
+
+    def gauss(self, mu, sigma):
+        """
+        Draws a normal number, as :func:`random.gauss` does.
+
+        :param mu: the mean
+        :param sigma: the standard deviation
+        :return value: float
+        """
+        return mu + sigma * self.normal()
+
+    def get_state(self):
+        """
+        Records the position of the source, e.g. for a checkpoint.
+
+        :return state: dictionary with the state of each stream
+        """
+        return {name: stream.get_state() for name, stream in self._streams.items()}
+
+    def set_state(self, state):
+        """
+        Moves the source to a position recorded with :func:`get_state`.
+
+        :param state: dictionary with the state of each stream
+        """
+        for name, stream in self._streams.items():
+            stream.set_state(state[name])
+        self._bind()
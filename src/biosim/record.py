@@ -0,0 +1,131 @@
+"""
+:mod:`record` keeps the per-year results of a simulation in NumPy arrays.
+
+The arrays are allocated ahead and doubled in size when full,
+so appending a year costs a few array assignments and an occasional copy,
+and the results of thousands of years take a few kilobytes.
+A :data:`year_snapshot` holds the state after a single year.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+year_snapshot = namedtuple('year_snapshot', ('year', 'herbivores', 'carnivores',
+                                             'density', 'stats', 'animals'))
+year_snapshot.__doc__ = """
+The state of a simulation after a year, as yielded by :func:`biosim.BioSim.iter_years`.
+density is a tuple with the herbivore and carnivore grids, stats a dictionary of
+:class:`sketches.kll_sketch` per species and property, and animals a dictionary with the
+columns of each species. Each of them is None unless asked for.
+"""
+
+
+class year_record:
+    """
+    Per-year animal counts of a simulation, with optional density snapshots.
+
+    :param shape: shape of the island map, needed for density snapshots
+    :param density: if True, the number of each species in every cell is kept each year
+    :param capacity: number of years allocated at the start
+    """
+
+    def __init__(self, shape=None, density=False, capacity=64):
+        if density and shape is None:
+            raise ValueError('Density snapshots need the shape of the island')
+        self.shape = shape
+        self.n_years = 0
+        self._years = np.zeros(capacity, dtype=int)
+        self._counts = np.zeros((capacity, 2), dtype=int)
+        self._density = np.zeros((capacity, 2) + tuple(shape), dtype=int) if density else None
+
+    def __len__(self):
+        return self.n_years
+
+    def _grow(self):
+        """
+        Doubles the allocated number of years.
+        """
+        capacity = 2 * len(self._years)
+        self._years = np.resize(self._years, capacity)
+        self._counts = np.resize(self._counts, (capacity, 2))
+        if self._density is not None:
+            self._density = np.resize(self._density, (capacity, 2) + tuple(self.shape))
+
+    def append(self, year, isl):
+        """
+        Adds the counts of an island at the end of a year.
+
+        :param year: the year
+        :param isl: the :class:`island.island`
+        """
+        if self.n_years == len(self._years):
+            self._grow()
+        species_count = isl.species_count()
+        self._years[self.n_years] = year
+        self._counts[self.n_years] = species_count['Herbivore'], species_count['Carnivore']
+        if self._density is not None:
+            self._density[self.n_years] = isl.distrubution()
+        self.n_years += 1
+
+    def arrays(self):
+        """
+        :return arrays: dictionary with the recorded years, counts and density snapshots,
+            e.g. for a checkpoint.
+        """
+        arrays = {'years': self.years, 'counts': self._counts[:self.n_years]}
+        if self._density is not None:
+            arrays['density'] = self.density
+        return arrays
+
+    def restore(self, arrays):
+        """
+        Replaces the recorded years with those from :func:`arrays`.
+
+        :param arrays: dictionary with the years, counts and density snapshots
+        """
+        self.n_years = 0
+        while len(self._years) < len(arrays['years']):
+            self._grow()
+        self.n_years = len(arrays['years'])
+        self._years[:self.n_years] = arrays['years']
+        self._counts[:self.n_years] = arrays['counts']
+        if self._density is not None:
+            self._density[:self.n_years] = arrays['density']
+
+    @property
+    def years(self):
+        """
+        Array with the recorded years.
+        """
+        return self._years[:self.n_years]
+
+    @property
+    def herbivores(self):
+        """
+        Array with the number of herbivores each recorded year.
+        """
+        return self._counts[:self.n_years, 0]
+
+    @property
+    def carnivores(self):
+        """
+        Array with the number of carnivores each recorded year.
+        """
+        return self._counts[:self.n_years, 1]
+
+    @property
+    def totals(self):
+        """
+        Array with the total number of animals each recorded year.
+        """
+        return self._counts[:self.n_years].sum(axis=1)
+
+    @property
+    def density(self):
+        """
+        Array of shape (years, 2, rows, columns) with the herbivores and carnivores
+        in every cell each recorded year, None if density snapshots are not kept.
+        """
+        if self._density is None:
+            return None
+        return self._density[:self.n_years]
@@ -0,0 +1,139 @@
+"""
+:mod:`results` writes the yearly animal counts of a simulation as a table.
+
+A :class:`results_writer` keeps the rows of the last years in a NumPy buffer and writes them
+in one block when the buffer is full, as comma-separated text with a header line,
+or, for a file name ending in .npy, as a growing .npy file of a structured array.
+For the .npy file, the rows are appended to the end of the file and the shape in the header
+is rewritten in place, so a flush never rereads the rows written before.
+Either file is read back with :func:`load_results`.
+A writer for a resumed simulation keeps the rows of the years before it in the file.
+"""
+
+import os
+import numpy as np
+
+_LANDSCAPES = ('L', 'H', 'D')
+
+
+class results_writer:
+    """
+    Buffered writer of the animal counts of each year.
+
+    :param path: name of the file, replaced if it exists
+    :param isl: the :class:`island.island`, giving the landscape types for landscape counts
+    :param landscapes: if True, the number of each species in every landscape type
+        of the island is written too
+    :param flush_years: number of years kept in the buffer before they are written
+    :param resume_year: if given and the file exists, the rows up to this year are kept
+        and the new rows written after them, e.g. for a simulation resumed from a checkpoint.
+        Otherwise the file is replaced.
+
+    The columns are year, total, herbivores and carnivores, followed, with landscapes,
+    by herbivores_<type> and carnivores_<type> for each habitable landscape type on the island.
+    """
+
+    def __init__(self, path, isl, landscapes=False, flush_years=100, resume_year=None):
+        self.path = str(path)
+        self.flush_years = flush_years
+        self._masks = {}
+        if landscapes:
+            self._masks = {land: isl.landscape == land for land in _LANDSCAPES
+                           if np.any(isl.landscape == land)}
+        names = ['year', 'total', 'herbivores', 'carnivores']
+        for land in self._masks:
+            names += ['herbivores_' + land, 'carnivores_' + land]
+        self.dtype = np.dtype([(name, np.int64) for name in names])
+        self._buffer = np.zeros(flush_years, dtype=self.dtype)
+        self._n_buffered = 0
+        self.n_written = 0
+        self._npy = self.path.endswith('.npy')
+        if resume_year is not None and os.path.exists(self.path):
+            self._resume(resume_year)
+            return
+        with open(self.path, 'wb') as file:
+            if self._npy:
+                self._write_header(file)
+            else:
+                file.write((','.join(names) + '\n').encode())
+
+    def _resume(self, resume_year):
+        """
+        Cuts the file after the last row of a year up to resume_year.
+        """
+        results = load_results(self.path)
+        if results.dtype.names != self.dtype.names:
+            raise ValueError('The columns of {} do not match the log'.format(self.path))
+        self.n_written = int(np.count_nonzero(results['year'] <= resume_year))
+        with open(self.path, 'r+b') as file:
+            if self._npy:
+                np.lib.format.read_magic(file)
+                np.lib.format.read_array_header_1_0(file)
+                file.truncate(file.tell() + self.n_written * self.dtype.itemsize)
+                self._write_header(file)
+            else:
+                lines = file.readlines()[:1 + self.n_written]
+                file.seek(0)
+                file.writelines(lines)
+                file.truncate()
+
+    def _write_header(self, file):
+        """
+        Writes the .npy header for the rows written so far at the start of the file.
+        NumPy leaves room in the header for the number of rows to grow.
+        """
+        file.seek(0)
+        np.lib.format.write_array_header_1_0(
+            file, {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False,
+                   'shape': (self.n_written,)})
+
+    def append(self, year, isl):
+        """
+        Adds the counts of an island at the end of a year,
+        writing the buffer if it is full.
+
+        :param year: the year
+        :param isl: the :class:`island.island`
+        """
+        row = self._buffer[self._n_buffered]
+        species_count = isl.species_count()
+        row['year'] = year
+        row['herbivores'] = species_count['Herbivore']
+        row['carnivores'] = species_count['Carnivore']
+        row['total'] = species_count['Herbivore'] + species_count['Carnivore']
+        for land, mask in self._masks.items():
+            row['herbivores_' + land] = isl.density['herbivore'][mask].sum()
+            row['carnivores_' + land] = isl.density['carnivore'][mask].sum()
+        self._n_buffered += 1
+        if self._n_buffered == self.flush_years:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the rows in the buffer to the file.
+        """
+        if self._n_buffered == 0:
+            return
+        rows = self._buffer[:self._n_buffered]
+        with open(self.path, 'r+b' if self._npy else 'ab') as file:
+            if self._npy:
+                file.seek(0, 2)
+                file.write(rows.tobytes())
+                self.n_written += len(rows)
+                self._write_header(file)
+            else:
+                np.savetxt(file, rows, fmt='%d', delimiter=',')
+                self.n_written += len(rows)
+        self._n_buffered = 0
+
+
+def load_results(path):
+    """
+    Reads a file written by :class:`results_writer`.
+
+    :param path: name of the file
+    :return results: structured array with a field for every column
+    """
+    if str(path).endswith('.npy'):
+        return np.load(path)
+    return np.atleast_1d(np.genfromtxt(path, delimiter=',', names=True, dtype=np.int64))
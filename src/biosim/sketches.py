@@ -0,0 +1,174 @@
+"""
+:mod:`sketches` keeps approximate quantiles of animal properties in constant memory.
+
+A :class:`kll_sketch` follows the KLL sketch of Karnin, Lang and Liberty.
+Values are kept in levels, where a value in level h stands for 2**h of the values added.
+When the sketch holds more values than the sum of the level capacities, the lowest level
+at its capacity is sorted and every other value is moved up one level,
+starting at the first or second value at random.
+The capacities shrink by a factor 2/3 per level below the top, down to at least 8,
+so the sketch holds about 3k values however many are added, in however small updates,
+and quantiles are off by a rank error of about 1.7/k of the number of values.
+
+Sketches of the same property can be merged, e.g. for several tiles or replicates.
+The count, mean, minimum and maximum are kept exactly.
+"""
+
+import numpy as np
+from biosim import streams
+
+SPECIES = ('Herbivore', 'Carnivore')
+PROPERTIES = ('weight', 'age', 'fitness')
+
+
+class kll_sketch:
+    """
+    Streaming, mergeable quantile sketch.
+
+    :param k: size of the top level, larger values give more accurate quantiles.
+    :param seed: seed of the random choices made when compacting a level
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """
+        Adds values to the sketch.
+
+        :param values: array of values
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+
+    def _compress(self):
+        """
+        Compacts the lowest level at its capacity until the sketch fits its capacities.
+        """
+        while len(self) > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h in range(len(self.levels))
+                     if len(self.levels[h]) >= self._capacity(h))
+            self._compact(h)
+
+    def _compact(self, h):
+        """
+        Moves every other value of a level one level up. If the level holds an odd number
+        of values, its smallest or largest value, chosen at random, stays behind.
+        """
+        if h + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        items = np.sort(self.levels[h])
+        kept = items[:0]
+        if len(items) % 2:
+            if self._rng.integers(2):
+                kept, items = items[-1:], items[:-1]
+            else:
+                kept, items = items[:1], items[1:]
+        self.levels[h] = kept
+        self.levels[h + 1] = np.concatenate((self.levels[h + 1],
+                                             items[self._rng.integers(2)::2]))
+
+    def merge(self, other):
+        """
+        Combines two sketches into a new sketch, as if all values were added to one.
+
+        :param other: another :class:`kll_sketch`
+        :return sketch: the merged sketch
+        """
+        merged = kll_sketch(max(self.k, other.k),
+                            seed=self._rng.bit_generator.seed_seq.spawn(1)[0])
+        n_levels = max(len(self.levels), len(other.levels))
+        merged.levels = [np.concatenate([sketch.levels[h] for sketch in (self, other)
+                                         if h < len(sketch.levels)]) for h in range(n_levels)]
+        merged.count = self.count + other.count
+        merged.total = self.total + other.total
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        merged._compress()
+        return merged
+
+    @property
+    def mean(self):
+        """
+        The exact mean of the values added, nan if none.
+        """
+        return self.total / self.count if self.count > 0 else np.nan
+
+    def quantile(self, q):
+        """
+        Estimates quantiles of the values added.
+
+        :param q: quantile or array of quantiles between 0 and 1
+        :return values: the estimated quantiles, nan if no values are added
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1])
+        return items[order][np.minimum(index, len(items) - 1)]
+
+    def summary(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        :param quantiles: the quantiles to estimate
+        :return summary: dictionary with count, mean, min, max and the estimated quantiles,
+            keyed by the quantile value.
+        """
+        summary = {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max}
+        summary.update(zip(quantiles, np.atleast_1d(self.quantile(quantiles)).tolist()))
+        return summary
+
+
+def population_sketches(isl, k=200):
+    """
+    Makes sketches of the weight, age and fitness of every species on an island.
+    The sketches are seeded from the random streams of the island and its year,
+    so they are the same for every run with the same seed.
+
+    :param isl: the :class:`island.island`
+    :param k: size parameter of the sketches, see :class:`kll_sketch`
+    :return sketches: dictionary mapping species names to dictionaries of
+        :class:`kll_sketch` per property.
+    """
+    sketches = {}
+    for species in SPECIES:
+        columns = isl.animal_columns(species.lower())
+        sketches[species] = {}
+        for number, prop in enumerate(PROPERTIES):
+            seed = isl._streams.seed(isl._year, streams.SPECIES[species.lower()], number)
+            sketches[species][prop] = kll_sketch(k, seed)
+            sketches[species][prop].update(columns[prop])
+    return sketches
+
+
+def merge_population_sketches(first, second):
+    """
+    Merges two results of :func:`population_sketches`, e.g. from two replicates.
+
+    :return sketches: dictionary mapping species names to dictionaries of merged sketches.
+    """
+    return {species: {prop: first[species][prop].merge(second[species][prop])
+                      for prop in first[species]} for species in first}
@@ -0,0 +1,168 @@
+"""
+:mod:`streams` gives counter-based random numbers for the 'array' and 'tiled' engines.
+
+Instead of drawing from one generator in the order the animals are visited, every number is a
+hash of the seed, the year, the yearly phase, the species, the cell and a counter.
+An animal's draws depend on its cell and its place among the animals of that cell,
+and the draws of a cell depend only on the cell, so the results are the same
+whichever order the cells are visited in, and however the island is split between processes.
+
+The hash is the SplitMix64 finalizer, computed on NumPy uint64 arrays.
+"""
+
+import numpy as np
+
+PHASES = {'grazing': 1, 'hunting': 2, 'breeding': 3, 'migration': 4, 'aging_death': 5}
+SPECIES = {'herbivore': 1, 'carnivore': 2}
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(x):
+    """
+    SplitMix64 finalizer, scrambling every bit of x into every bit of the result.
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _hash(base, word):
+    """
+    Combines a hash with a new word.
+
+    :param base: uint64 hash, or array of hashes
+    :param word: non-negative integer or integer array
+    :return hash: uint64 array
+    """
+    with np.errstate(over='ignore'):
+        return _mix(np.asarray(base, dtype=np.uint64)
+                    ^ _mix(np.asarray(word).astype(np.uint64) + _GOLDEN))
+
+
+def _unit(bits):
+    """
+    Turns uint64 hashes into floats uniform on [0, 1).
+    """
+    return (bits >> np.uint64(11)) * 2.0 ** -53
+
+
+class animal_stream:
+    """
+    One stream of numbers per animal, keyed by the cell of the animal and its place in the cell.
+    Every call draws one number for every animal, so the animals must be sorted by cell,
+    as in a :class:`population.population_store`.
+    It has the methods of :class:`numpy.random.Generator` used by :mod:`kernels`.
+
+    :param base: hash of the seed, year, phase and species
+    :param cell: array with the cell index of each animal, sorted
+    """
+
+    def __init__(self, base, cell):
+        counts = np.bincount(cell)
+        rank = np.arange(len(cell)) - (np.cumsum(counts) - counts)[cell]
+        self._base = _hash(_hash(base, cell), rank)
+        self._draw = 0
+
+    def random(self, size):
+        if size != len(self._base):
+            raise ValueError('An animal stream draws one number per animal')
+        self._draw += 1
+        return _unit(_hash(self._base, self._draw))
+
+    def normal(self, loc, scale, size):
+        u = 1 - self.random(size)
+        return loc + scale * np.sqrt(-2 * np.log(u)) * np.cos(2 * np.pi * self.random(size))
+
+    def integers(self, low, high, size):
+        return low + (self.random(size) * (high - low)).astype(np.int64)
+
+
+class cell_stream:
+    """
+    One sequential stream of numbers for a single cell,
+    with the :func:`random` method of :class:`numpy.random.Generator`.
+    The numbers are made in blocks, as :func:`kernels.hunting` asks for a few at a time.
+
+    :param base: hash of the seed, year, phase and species
+    :param cell: the cell index
+    """
+
+    block = 256
+
+    def __init__(self, base, cell):
+        self._base = _hash(base, cell)
+        self._buffer = np.empty(0)
+        self._start = 0
+        self._used = 0
+
+    def random(self, size):
+        if self._used + size > len(self._buffer):
+            self._start += self._used
+            counter = np.arange(self._start, self._start + max(size, self.block))
+            self._buffer = _unit(_hash(self._base, counter))
+            self._used = 0
+        self._used += size
+        return self._buffer[self._used - size:self._used]
+
+
+class phase_stream:
+    """
+    The streams of one species in one phase of one year.
+
+    :param base: hash of the seed, year, phase and species
+    """
+
+    def __init__(self, base):
+        self.base = base
+
+    def animals(self, cell):
+        """
+        :return stream: :class:`animal_stream` for animals in the given cells.
+        """
+        return animal_stream(self.base, cell)
+
+    def cell(self, cell):
+        """
+        :return stream: :class:`cell_stream` for the given cell.
+        """
+        return cell_stream(self.base, cell)
+
+
+class random_streams:
+    """
+    All random streams of a simulation.
+
+    :param seed: Integer used as random number seed, a random key is used if None.
+    """
+
+    def __init__(self, seed=None):
+        self.key = np.random.SeedSequence(seed).generate_state(1, np.uint64)[0]
+
+    def phase(self, year, phase, species):
+        """
+        Fetches the streams of one species in one phase of one year.
+
+        :param year: number of the year being simulated
+        :param phase: name of the phase, one of :data:`PHASES`
+        :param species: name of the species, one of :data:`SPECIES`
+        :return streams: :class:`phase_stream`
+        """
+        return phase_stream(_hash(_hash(_hash(self.key, year), PHASES[phase]),
+                                  SPECIES[species]))
+
+    def seed(self, year, *words):
+        """
+        Makes a seed for random choices outside the yearly phases,
+        e.g. of a :class:`sketches.kll_sketch`.
+
+        :param year: number of the year
+        :param words: further non-negative integers the seed depends on
+        :return seed: integer seed for :func:`numpy.random.default_rng`
+        """
+        base = _hash(_hash(self.key, year), 0)
+        for word in words:
+            base = _hash(base, word)
+        return int(base)
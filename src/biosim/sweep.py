@@ -0,0 +1,207 @@
+"""
+:mod:`sweep` runs simulations over a grid or a random design of animal and landscape parameters.
+
+A parameter space is given as a nested dictionary, with species names or landscape codes
+on the first level and parameter names on the second, e.g.
+
+.. code-block:: python
+
+    space = {'Herbivore': {'zeta': [3.0, 3.5, 4.0], 'xi': [1.1, 1.2]},
+             'L': {'f_max': [600.0, 800.0]}}
+
+Every combination of parameters is run for several seeds in worker processes,
+and the count series of each run is written to a :class:`results_store`,
+keyed by a hash of the parameters.
+"""
+
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import numpy as np
+from biosim.ensemble import run_replicate
+
+SPECIES_NAMES = ('Herbivore', 'Carnivore')
+
+
+def _axes(space):
+    """
+    Flattens a parameter space into a list of axes.
+
+    :param space: nested dictionary of parameter values or ranges
+    :return axes: list of (group, parameter, values) tuples
+    """
+    return [(group, param, values)
+            for group, params in sorted(space.items())
+            for param, values in sorted(params.items())]
+
+
+def _nest(axes, point):
+    """
+    Turns one value per axis back into a nested parameter dictionary.
+
+    :param axes: list of axes from :func:`_axes`
+    :param point: sequence with one value per axis
+    :return params: nested dictionary of parameter values
+    """
+    params = {}
+    for (group, param, _), value in zip(axes, point):
+        params.setdefault(group, {})[param] = float(value)
+    return params
+
+
+def grid_design(space):
+    """
+    Expands a parameter space into all combinations of its values.
+
+    :param space: nested dictionary with a list of values for every parameter
+    :return design: list of nested parameter dictionaries
+    """
+    axes = _axes(space)
+    return [_nest(axes, point) for point in itertools.product(*[values for *_, values in axes])]
+
+
+def random_design(space, n_points, seed=None):
+    """
+    Draws parameter combinations uniformly at random from a parameter space.
+
+    :param space: nested dictionary with a (low, high) range for every parameter
+    :param n_points: number of combinations to draw
+    :param seed: Integer used as random number seed
+    :return design: list of nested parameter dictionaries
+    """
+    axes = _axes(space)
+    rng = np.random.default_rng(seed)
+    points = rng.uniform([values[0] for *_, values in axes],
+                         [values[1] for *_, values in axes], (n_points, len(axes)))
+    return [_nest(axes, point) for point in points]
+
+
+def param_hash(params):
+    """
+    Makes a key for a parameter combination, independent of the order of the dictionaries.
+
+    :param params: nested parameter dictionary
+    :return key: hexadecimal string
+    """
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class results_store:
+    """
+    Directory holding the count series of a sweep.
+    Every parameter combination gets a sub-directory named by :func:`param_hash`,
+    with the parameters in params.json and one seed_<seed>.npy file per seed.
+
+    :param path: the directory, created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, params, seed):
+        return os.path.join(self.path, param_hash(params), 'seed_{}.npy'.format(seed))
+
+    def save(self, params, seed, counts):
+        """
+        Writes the count series of one run.
+
+        :param params: nested parameter dictionary of the run
+        :param seed: the seed of the run
+        :param counts: integer array of species counts per year
+        """
+        folder = os.path.join(self.path, param_hash(params))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, 'params.json'), 'w') as file:
+            json.dump(params, file, sort_keys=True)
+        np.save(self._file(params, seed), counts)
+
+    def has(self, params, seed):
+        """
+        Checks if the store holds a run.
+
+        :return boolean: True if the run is stored.
+        """
+        return os.path.isfile(self._file(params, seed))
+
+    def load(self, params, seed):
+        """
+        Reads the count series of one run.
+
+        :return counts: integer array of species counts per year.
+        """
+        return np.load(self._file(params, seed))
+
+    def keys(self):
+        """
+        Lists the parameter combinations in the store.
+
+        :return keys: dictionary mapping each parameter hash to its parameters.
+        """
+        keys = {}
+        for key in sorted(os.listdir(self.path)):
+            params_file = os.path.join(self.path, key, 'params.json')
+            if os.path.isfile(params_file):
+                with open(params_file) as file:
+                    keys[key] = json.load(file)
+        return keys
+
+
+def _run_sweep_job(job):
+    """
+    Runs one parameter combination and seed in a worker process, and stores the counts.
+
+    :param job: tuple with the store path, the parameters, the seed and the keyword arguments
+        for :func:`ensemble.run_replicate`.
+    :return key, seed, years: parameter hash, seed and number of years simulated.
+    """
+    path, params, seed, kwargs = job
+    counts = run_replicate(seed=seed,
+                           animal_params={group: values for group, values in params.items()
+                                          if group in SPECIES_NAMES},
+                           landscape_params={group: values for group, values in params.items()
+                                             if group not in SPECIES_NAMES},
+                           **kwargs)
+    results_store(path).save(params, seed, counts)
+    return param_hash(params), seed, len(counts) - 1
+
+
+def run_sweep(island_map, ini_pop, design, seeds, num_years, path, events=None,
+              engine='object', max_animals=None, processes=None):
+    """
+    Runs every parameter combination of a design for every seed, in a pool of worker processes.
+    Runs already in the store are skipped, so an interrupted sweep can be continued.
+    A run stops early once both species are extinct, or when the number of animals
+    exceeds max_animals.
+
+    :param island_map: Multi-line string specifying island geography
+    :param ini_pop: List of dictionaries specifying initial population
+    :param design: list of nested parameter dictionaries,
+        from :func:`grid_design` or :func:`random_design`
+    :param seeds: sequence of integer seeds, one run is made for each combination and seed
+    :param num_years: number of years to simulate
+    :param path: directory of the :class:`results_store`
+    :param events: dictionary mapping a year to a population added after that many years
+    :param engine: 'object' or 'array', see :class:`island.island`
+    :param max_animals: population bound for stopping runs early
+    :param processes: number of worker processes, all cores if None.
+        With 1, the runs are made in the calling process.
+    :return store: the :class:`results_store` holding the results.
+    """
+    store = results_store(path)
+    kwargs = dict(island_map=island_map, ini_pop=ini_pop, num_years=num_years, events=events,
+                  engine=engine, max_animals=max_animals)
+    jobs = [(path, params, seed, kwargs) for params in design for seed in seeds
+            if not store.has(params, seed)]
+
+    if processes == 1:
+        for job in jobs:
+            _run_sweep_job(job)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for _ in pool.imap_unordered(_run_sweep_job, jobs):
+                pass
+    return store
@@ -0,0 +1,662 @@
+"""
+:mod:`tiles` splits the island into bands of rows, each simulated by its own worker process.
+
+Every tile keeps a :class:`population.population_store` per species for the animals in its rows,
+and runs grazing, hunting, breeding, aging and death locally.
+After the migration, the animals that moved into the rows of another tile are sent to that tile
+in one halo exchange per year. As animals only migrate to the neighbouring cells,
+a tile only exchanges animals with the tiles right above and below it.
+
+The exchange goes through a transport, which is either :class:`queue_transport`,
+using multiprocessing queues between processes on one machine,
+or :class:`socket_transport`, using sockets from :mod:`multiprocessing.connection`.
+The worker processes are started on the local machine by :class:`tile_group`,
+unless the socket transport is given the addresses of workers started with
+:func:`serve_tile`, which can run on other machines::
+
+    # on each machine running a tile
+    serve_tile(('0.0.0.0', 6100))
+
+    # on the machine running the simulation
+    transport = socket_transport(addresses=[('node1', 6000), ('node2', 6000)],
+                                 workers=[('node1', 6100), ('node2', 6100)])
+    sim = BioSim(island_map, ini_pop, seed, engine='tiled', tiles=2, transport=transport)
+
+The tile i listens for its neighbours on addresses[i], so that address must be on the machine
+running worker i, and reachable from the machines of the neighbouring tiles.
+
+If a worker fails, or a neighbour sends nothing within the timeout of the transport,
+the whole group is stopped and the error is raised in the island.
+"""
+
+import multiprocessing
+import queue
+import socket
+import threading
+import time
+from functools import partial
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from biosim.animals import herbivore, carnivore
+from biosim.population import population_store
+from biosim.streams import random_streams
+
+
+def split_rows(habitable, n_tiles):
+    """
+    Splits the rows of the map into bands with about the same number of habitable cells.
+
+    :param habitable: 2d boolean array, True for the habitable cells of the map
+    :param n_tiles: number of bands
+    :return rows: list of (start, end) row ranges, one per band
+    """
+    n_rows = habitable.shape[0]
+    if not 0 < n_tiles <= n_rows:
+        raise ValueError('The number of tiles must be between 1 and the number of rows')
+    land = np.cumsum(habitable.sum(axis=1))
+    cuts = np.searchsorted(land, land[-1] * np.arange(1, n_tiles) / n_tiles) + 1
+    cuts = list(np.clip(cuts, 1, n_rows - 1))
+    for i in range(len(cuts)):
+        cuts[i] = min(max(cuts[i], cuts[i - 1] + 1 if i > 0 else 1), n_rows - n_tiles + i + 1)
+    bounds = [0] + [int(cut) for cut in cuts] + [n_rows]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class _queue_endpoint:
+    """
+    The end of a :class:`queue_transport` used by one tile.
+    Every tile reads from its own inbox, and the other tiles put (source, payload) into it.
+    """
+
+    def __init__(self, index, neighbours, inboxes, timeout):
+        self.index = index
+        self.neighbours = neighbours
+        self.inboxes = inboxes
+        self.timeout = timeout
+
+    def open(self):
+        pass
+
+    def exchange(self, payloads):
+        """
+        Sends a payload to every neighbouring tile and receives one from each.
+
+        :param payloads: dictionary mapping each neighbouring tile to the payload sent to it
+        :return received: dictionary mapping each neighbouring tile to the payload received
+        """
+        for dest, payload in payloads.items():
+            self.inboxes[dest].put((self.index, payload))
+        try:
+            return dict(self.inboxes[self.index].get(timeout=self.timeout)
+                        for _ in self.neighbours)
+        except queue.Empty:
+            raise TimeoutError('Tile {} got no halo from its neighbours'.format(self.index))
+
+    def close(self):
+        pass
+
+
+class queue_transport:
+    """
+    Transport between tiles on one machine, through one multiprocessing queue per tile.
+
+    :param timeout: seconds a tile waits for the halo of its neighbours
+    """
+
+    def __init__(self, timeout=600):
+        self.timeout = timeout
+
+    def endpoints(self, neighbours):
+        """
+        Makes the ends of the transport for all tiles.
+
+        :param neighbours: list with the neighbouring tiles of every tile
+        :return endpoints: list with one endpoint per tile
+        """
+        inboxes = [multiprocessing.Queue() for _ in neighbours]
+        return [_queue_endpoint(index, tiles, inboxes, self.timeout)
+                for index, tiles in enumerate(neighbours)]
+
+
+def _connect(address, authkey, timeout):
+    """
+    Connects to an address, waiting up to timeout seconds for it to start listening.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(tuple(address), authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.02)
+
+
+class _socket_endpoint:
+    """
+    The end of a :class:`socket_transport` used by one tile.
+    On :func:`open`, the tile listens on its own address and connects to each neighbour,
+    so every pair of neighbouring tiles is joined by one connection in each direction.
+    """
+
+    def __init__(self, index, neighbours, addresses, authkey, timeout, exchange_timeout):
+        self.index = index
+        self.neighbours = neighbours
+        self.addresses = addresses
+        self.authkey = authkey
+        self.timeout = timeout
+        self.exchange_timeout = exchange_timeout
+        self._outgoing = {}
+        self._incoming = {}
+
+    def open(self):
+        """
+        Sets up the connections to the neighbouring tiles.
+        Incoming connections are accepted in a thread while the outgoing ones are made.
+        """
+        listener = Listener(self.addresses[self.index], authkey=self.authkey)
+
+        def accept():
+            for _ in self.neighbours:
+                connection = listener.accept()
+                self._incoming[connection.recv()] = connection
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        for dest in self.neighbours:
+            self._outgoing[dest] = _connect(self.addresses[dest], self.authkey, self.timeout)
+            self._outgoing[dest].send(self.index)
+        thread.join()
+        listener.close()
+
+    def exchange(self, payloads):
+        """
+        Sends a payload to every neighbouring tile and receives one from each.
+        The payloads are sent from a thread, so two tiles sending large payloads to each other
+        do not wait for each other.
+
+        :param payloads: dictionary mapping each neighbouring tile to the payload sent to it
+        :return received: dictionary mapping each neighbouring tile to the payload received
+        """
+        def send():
+            for dest, payload in payloads.items():
+                self._outgoing[dest].send(payload)
+
+        thread = threading.Thread(target=send, daemon=True)
+        thread.start()
+        received = {}
+        for source, connection in self._incoming.items():
+            if not connection.poll(self.exchange_timeout):
+                raise TimeoutError('Tile {} got no halo from tile {}'.format(self.index, source))
+            received[source] = connection.recv()
+        thread.join()
+        return received
+
+    def close(self):
+        for connection in list(self._outgoing.values()) + list(self._incoming.values()):
+            connection.close()
+
+
+class socket_transport:
+    """
+    Transport between tiles through sockets.
+
+    :param addresses: list of (host, port) addresses the tiles listen on, one per tile.
+        If None, free ports on the local machine are used.
+    :param authkey: bytes used to authenticate the connections
+    :param timeout: seconds to wait for a neighbour or a worker to start listening
+    :param exchange_timeout: seconds a tile waits for the halo of each neighbour
+    :param workers: list of (host, port) addresses of workers started with :func:`serve_tile`,
+        one per tile. If None, :class:`tile_group` starts the workers as local processes.
+    """
+
+    def __init__(self, addresses=None, authkey=b'biosim', timeout=30, exchange_timeout=600,
+                 workers=None):
+        self.addresses = addresses
+        self.workers = workers
+        self.authkey = authkey
+        self.timeout = timeout
+        self.exchange_timeout = exchange_timeout
+
+    def endpoints(self, neighbours):
+        """
+        Makes the ends of the transport for all tiles.
+
+        :param neighbours: list with the neighbouring tiles of every tile
+        :return endpoints: list with one endpoint per tile
+        """
+        addresses = self.addresses
+        if addresses is None:
+            addresses = []
+            for _ in neighbours:
+                with socket.socket() as sock:
+                    sock.bind(('127.0.0.1', 0))
+                    addresses.append(sock.getsockname())
+        return [_socket_endpoint(index, tiles, addresses, self.authkey, self.timeout,
+                                 self.exchange_timeout)
+                for index, tiles in enumerate(neighbours)]
+
+
+class tile:
+    """
+    The part of the island simulated by one worker process.
+
+    :param index: number of the tile
+    :param rows: the (start, end) rows owned by the tile
+    :param shape: tuple with the number of rows and columns of the island
+    :param owner: integer array with the tile owning every flat cell index
+    :param neighbours: neighbour table of the island, see :func:`kernels.neighbour_table`
+    :param streams: the :class:`streams.random_streams` of the island
+    :param n_tiles: number of tiles of the island.
+        The tile numbers its animals index, index + n_tiles, index + 2 * n_tiles, ...,
+        so the ids are unique over all tiles.
+    """
+
+    def __init__(self, index, rows, shape, owner, neighbours, streams, n_tiles=1):
+        self.index = index
+        self.cells = slice(rows[0] * shape[1], rows[1] * shape[1])
+        self.owner = owner
+        self.neighbours = neighbours
+        self.fodder = np.zeros(shape[0] * shape[1])
+        self.streams = streams
+        self.stores = {'herbivore': population_store(herbivore.copy_species(), shape),
+                       'carnivore': population_store(carnivore.copy_species(), shape)}
+        for store in self.stores.values():
+            store.next_id = index
+            store.id_step = n_tiles
+
+    def add(self, species, cells, weights, ages):
+        """
+        Adds animals to the tile, as :func:`population.population_store.add` does.
+        """
+        self.stores[species].add(cells, weights, ages)
+
+    def merge(self, species, columns):
+        """
+        Puts animals with all their columns into the tile,
+        as :func:`population.population_store.merge` does.
+        """
+        self.stores[species].merge(columns)
+
+    def sim_year(self, endpoint, year, f_max, params):
+        """
+        Simulates one year for the animals of the tile, with a halo exchange after the migration.
+        The random numbers come from the streams of each phase of the year,
+        and the animals received are sorted in among the others by the cell they came from,
+        so the result is the same as for the 'array' engine.
+
+        :param endpoint: the end of the transport used by the tile
+        :param year: number of the year being simulated
+        :param f_max: array with the f_max of the cells of the tile
+        :param params: dictionary mapping species names to their parameters on the island
+        :return counts: tuple with the count of herbivores and carnivores per flat cell index.
+        """
+        for species, values in params.items():
+            self.stores[species].species.update_params(
+                {param: value for param, value in values.items() if value is not None})
+        herb, carn = self.stores['herbivore'], self.stores['carnivore']
+
+        phase = partial(self.streams.phase, year)
+
+        self.fodder[self.cells] = f_max
+        herb.grazing(self.fodder, phase('grazing', 'herbivore'))
+        carn.hunting(herb, phase('hunting', 'carnivore'))
+        for name, store in self.stores.items():
+            store.breeding(phase('breeding', name))
+        for name, store in self.stores.items():
+            store.migration(self.neighbours, phase('migration', name))
+
+        payloads = {dest: {} for dest in endpoint.neighbours}
+        for species, store in self.stores.items():
+            leaving = store.split(self.owner[store.cell] != self.index)
+            dest_of = self.owner[leaving['cell']]
+            for dest in payloads:
+                payloads[dest][species] = {column: values[dest_of == dest]
+                                           for column, values in leaving.items()}
+        received = endpoint.exchange(payloads)
+        for source in sorted(received):
+            for species, columns in received[source].items():
+                self.stores[species].merge(columns)
+
+        for name, store in self.stores.items():
+            store.aging_death(phase('aging_death', name))
+        return herb.counts(), carn.counts()
+
+    def next_ids(self):
+        """
+        :return next_ids: dictionary mapping species names to the next id of the tile
+        """
+        return {species: store.next_id for species, store in self.stores.items()}
+
+    def set_next_ids(self, next_ids):
+        """
+        Replaces the next id of every species, e.g. after a checkpoint is restored.
+
+        :param next_ids: dictionary mapping species names to the next id
+        """
+        for species, next_id in next_ids.items():
+            self.stores[species].next_id = next_id
+
+    def columns(self, species):
+        """
+        Fetches all animals of some species on the tile.
+
+        :param species: names of the species to fetch
+        :return columns: dictionary mapping species names to the columns of their animals.
+        """
+        return {name: {column: getattr(self.stores[name], column)
+                       for column in self.stores[name].columns} for name in species}
+
+
+def _tile_worker(tile_args, endpoint, commands, results):
+    """
+    Runs a tile in a worker process, following the commands sent by :class:`tile_group`.
+    An error is sent back as a result, after which the worker stops,
+    and :class:`tile_group` stops the other workers and raises it.
+    """
+    try:
+        endpoint.open()
+        state = tile(*tile_args)
+        while True:
+            command, args = commands.get()
+            if command == 'year':
+                results.put(state.sim_year(endpoint, *args))
+            elif command == 'add':
+                state.add(*args)
+            elif command == 'merge':
+                state.merge(*args)
+            elif command == 'streams':
+                state.streams = args[0]
+            elif command == 'gather':
+                results.put(state.columns(*args))
+            elif command == 'next_ids':
+                results.put(state.next_ids())
+            elif command == 'set_next_ids':
+                state.set_next_ids(*args)
+            else:
+                break
+        endpoint.close()
+    except Exception as error:
+        results.put(error)
+
+
+class _connection_channel:
+    """
+    Commands and results of a tile sent over a connection instead of queues,
+    for a tile run by :func:`serve_tile`.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get(self):
+        return self.connection.recv()
+
+    def put(self, message):
+        self.connection.send(message)
+
+
+def serve_tile(address, authkey=b'biosim'):
+    """
+    Runs one tile of an island started elsewhere, e.g. on another machine.
+    Waits for a :class:`tile_group` made with the address in the workers of its
+    :class:`socket_transport` to connect, then runs the tile until the group is closed.
+
+    :param address: (host, port) address to listen on for the tile group
+    :param authkey: bytes used to authenticate the connection, as for the transport
+    """
+    with Listener(tuple(address), authkey=authkey) as listener:
+        with listener.accept() as connection:
+            tile_args, endpoint = connection.recv()
+            channel = _connection_channel(connection)
+            try:
+                _tile_worker(tile_args, endpoint, channel, channel)
+            except (EOFError, OSError):
+                pass
+
+
+class _remote_worker:
+    """
+    A tile run by :func:`serve_tile`, with the methods of the worker processes and queues
+    used by :class:`tile_group`.
+
+    :param address: (host, port) address of the worker
+    :param authkey: bytes used to authenticate the connection
+    :param timeout: seconds to wait for the worker to start listening
+    :param tile_args: the arguments of the :class:`tile`
+    :param endpoint: the end of the transport used by the tile
+    """
+
+    def __init__(self, address, authkey, timeout, tile_args, endpoint):
+        self._connection = _connect(address, authkey, timeout)
+        self._connection.send((tile_args, endpoint))
+
+    def put(self, message):
+        self._connection.send(message)
+
+    def get(self, timeout):
+        try:
+            if self._connection.poll(timeout):
+                return self._connection.recv()
+        except (EOFError, OSError):
+            self.terminate()
+        raise queue.Empty
+
+    def is_alive(self):
+        return not self._connection.closed
+
+    def terminate(self):
+        self._connection.close()
+
+    def join(self, timeout=None):
+        self.terminate()
+
+
+class tile_group:
+    """
+    The worker processes of an island split into tiles, as used by the 'tiled' engine
+    of :class:`island.island`.
+    The island keeps the map and the parameters, and sends them to the tiles every year.
+
+    :param shape: tuple with the number of rows and columns of the island
+    :param habitable: flat boolean array, True for the habitable cells
+    :param neighbours: neighbour table of the island, see :func:`kernels.neighbour_table`
+    :param n_tiles: number of tiles and worker processes
+    :param transport: 'queue', 'socket' or a transport object such as :class:`socket_transport`.
+        If the transport has workers, the tiles are run by those instead of local processes.
+    :param streams: the :class:`streams.random_streams` of the island
+    :param timeout: seconds to wait for the tiles to answer a command, no limit if None
+
+    If a worker fails or stops, or the tiles do not answer in time, all workers are stopped
+    and a RuntimeError or TimeoutError is raised; the group cannot be used after that.
+    """
+
+    def __init__(self, shape, habitable, neighbours, n_tiles=2, transport='queue',
+                 streams=None, timeout=None):
+        self.shape = shape
+        self.timeout = timeout
+        self.rows = split_rows(habitable.reshape(shape), n_tiles)
+        self.owner = np.repeat(np.arange(n_tiles), [(end - start) * shape[1]
+                                                    for start, end in self.rows])
+        if transport == 'queue':
+            transport = queue_transport()
+        elif transport == 'socket':
+            transport = socket_transport()
+        endpoints = transport.endpoints([[j for j in (i - 1, i + 1) if 0 <= j < n_tiles]
+                                         for i in range(n_tiles)])
+        streams = random_streams() if streams is None else streams
+        tile_args = [(i, self.rows[i], shape, self.owner, neighbours, streams, n_tiles)
+                     for i in range(n_tiles)]
+
+        workers = getattr(transport, 'workers', None)
+        if workers is not None:
+            if len(workers) != n_tiles:
+                raise ValueError('The transport has {} workers for {} tiles'.format(
+                    len(workers), n_tiles))
+            self._workers = [_remote_worker(address, transport.authkey, transport.timeout,
+                                            tile_args[i], endpoints[i])
+                             for i, address in enumerate(workers)]
+            self._commands = self._results = self._workers
+            return
+        self._commands = [multiprocessing.Queue() for _ in range(n_tiles)]
+        self._results = [multiprocessing.Queue() for _ in range(n_tiles)]
+        self._workers = [multiprocessing.Process(
+            target=_tile_worker, daemon=True,
+            args=(tile_args[i], endpoints[i], self._commands[i], self._results[i]))
+            for i in range(n_tiles)]
+        for worker in self._workers:
+            worker.start()
+
+    def _collect(self):
+        """
+        Waits for one result from every tile,
+        stopping all workers as soon as one of them fails or stops.
+        """
+        results = [None] * len(self._results)
+        pending = set(range(len(self._results)))
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while pending:
+            for i in sorted(pending):
+                try:
+                    results[i] = self._results[i].get(timeout=0.05)
+                except queue.Empty:
+                    if not self._workers[i].is_alive():
+                        self.abort()
+                        raise RuntimeError('Tile worker {} stopped'.format(i))
+                    continue
+                pending.discard(i)
+                if isinstance(results[i], Exception):
+                    self.abort()
+                    raise RuntimeError('Tile worker {} failed'.format(i)) from results[i]
+            if deadline is not None and time.monotonic() > deadline:
+                self.abort()
+                raise TimeoutError('The tile workers did not answer in time')
+        return results
+
+    def add(self, species, cells, weights, ages):
+        """
+        Sends animals to the tiles owning their cells, in one message per tile.
+
+        :param species: 'herbivore' or 'carnivore'
+        :param cells: array with the flat index of the cell of each animal
+        :param weights: sequence with the weight of each animal
+        :param ages: sequence with the age of each animal
+        """
+        cells = np.asarray(cells, dtype=np.intp)
+        owner = self.owner[cells]
+        weights, ages = np.asarray(weights), np.asarray(ages)
+        for i, commands in enumerate(self._commands):
+            mine = owner == i
+            if np.any(mine):
+                commands.put(('add', (species, cells[mine], weights[mine], ages[mine])))
+
+    def merge(self, species, columns):
+        """
+        Sends animals with all their columns, e.g. from a checkpoint, to the tiles owning
+        their cells.
+
+        :param species: 'herbivore' or 'carnivore'
+        :param columns: dictionary with an array for each of
+            :attr:`population.population_store.columns`
+        """
+        owner = self.owner[columns['cell']]
+        for i, commands in enumerate(self._commands):
+            commands.put(('merge', (species, {column: values[owner == i]
+                                              for column, values in columns.items()})))
+
+    def next_ids(self):
+        """
+        Fetches the next animal id of every tile, e.g. for a checkpoint.
+
+        :return next_ids: dictionary mapping species names to an integer array
+            with the next id of every tile
+        """
+        for commands in self._commands:
+            commands.put(('next_ids', ()))
+        results = self._collect()
+        return {species: np.array([next_ids[species] for next_ids in results], dtype=np.int64)
+                for species in results[0]}
+
+    def set_next_ids(self, next_ids):
+        """
+        Replaces the next animal id of every tile, as fetched by :func:`next_ids`.
+        If the ids were fetched from a different number of tiles, every tile continues
+        with its own ids after the largest id given.
+
+        :param next_ids: dictionary mapping species names to an integer array
+            with the next id of every tile
+        """
+        n_tiles = len(self._commands)
+        tile_ids = {}
+        for species, values in next_ids.items():
+            values = np.asarray(values, dtype=np.int64)
+            if len(values) != n_tiles:
+                start = int(values.max(initial=0))
+                values = start + (np.arange(n_tiles) - start) % n_tiles
+            tile_ids[species] = values
+        for i, commands in enumerate(self._commands):
+            commands.put(('set_next_ids', ({species: int(values[i])
+                                            for species, values in tile_ids.items()},)))
+
+    def set_streams(self, streams):
+        """
+        Replaces the random streams of all tiles.
+
+        :param streams: :class:`streams.random_streams`
+        """
+        for commands in self._commands:
+            commands.put(('streams', (streams,)))
+
+    def sim_year(self, year, f_max, params):
+        """
+        Simulates one year on all tiles.
+
+        :param year: number of the year being simulated
+        :param f_max: flat array with the f_max of every cell
+        :param params: dictionary mapping species names to their parameters on the island
+        :return herb, carn: integer arrays with the number of animals per flat cell index.
+        """
+        n_cols = self.shape[1]
+        for (start, end), commands in zip(self.rows, self._commands):
+            commands.put(('year', (year, f_max[start * n_cols:end * n_cols], params)))
+        counts = self._collect()
+        return sum(herb for herb, _ in counts), sum(carn for _, carn in counts)
+
+    def gather(self, species):
+        """
+        Collects the animals of all tiles into one store per species.
+        Only the species asked for are sent by the tiles.
+
+        :param species: dictionary mapping the names of the species to collect
+            to the species classes of the island
+        :return stores: dictionary mapping species names to :class:`population.population_store`
+        """
+        for commands in self._commands:
+            commands.put(('gather', (list(species),)))
+        stores = {name: population_store(cls, self.shape) for name, cls in species.items()}
+        for columns in self._collect():
+            for name, store in stores.items():
+                store.merge(columns[name])
+        return stores
+
+    def abort(self):
+        """
+        Stops the worker processes at once, e.g. after one of them failed.
+        """
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in self._workers:
+            worker.join(timeout=5)
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        for commands, worker in zip(self._commands, self._workers):
+            if worker.is_alive():
+                commands.put(('stop', ()))
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
@@ -130,7 +130,7 @@ class Graphics:
         self._hista_line_2 = None
 
     def update(self, step, sys_map_first, sys_map_second, all_animals, n_herbivores, n_carnivores,
-               w_herbivores, w_carnivores, f_herbivores, f_carnivores, a_herbivores, a_carnivores):
+               hist_herbivores, hist_carnivores):
         """
         Updates graphics and year count with current data and save to file if necessary.
 
@@ -140,20 +140,18 @@ class Graphics:
         :param all_animals: current number of animals
         :param n_herbivores: current number of herbivores
         :param n_carnivores: current number of carnivores
-        :param w_herbivores: current weights of carnivores
-        :param w_carnivores: current weights of herbivores
-        :param f_herbivores: current fitness of carnivores
-        :param f_carnivores: current fitness of herbivores
-        :param a_herbivores: current fitness of carnivores
-        :param a_carnivores: current fitness of herbivores
+        :param hist_herbivores: dictionary with the histogram counts of herbivore
+            weight, fitness and age, see :class:`histograms.histogram_collector`
+        :param hist_carnivores: dictionary with the histogram counts of carnivore
+            weight, fitness and age
         """
         if self._limits_w is not None:
             self._update_system_map_one(sys_map_first)
             self._update_system_map_two(sys_map_second)
             self._update_mean_graph(step, all_animals, n_herbivores, n_carnivores)
-            self._update_hist_w(w_herbivores, w_carnivores)
-            self._update_hist_f(f_herbivores, f_carnivores)
-            self._update_hist_a(a_herbivores, a_carnivores)
+            self._update_hist_w(hist_herbivores['weight'], hist_carnivores['weight'])
+            self._update_hist_f(hist_herbivores['fitness'], hist_carnivores['fitness'])
+            self._update_hist_a(hist_herbivores['age'], hist_carnivores['age'])
             self._fig.canvas.flush_events()
 
             self._txt.set_text(self._template.format(step))
@@ -414,46 +412,40 @@ class Graphics:
         y_data_3[step] = n_carnivores
         self._mean_line_3.set_ydata(y_data_3)
 
-    def _update_hist_w(self, w_herbivores, w_carnivores):
+    def _update_hist_w(self, countswh, countswc):
         """
         Updates the histograms of animal weight distribution
 
-        :param w_herbivores: Nested Array containing the current weights of herbivores on the island
-        :param w_carnivores: Nested Array containing the current weights of carnivores on the island
+        :param countswh: Array with the count of herbivores in each weight bin
+        :param countswc: Array with the count of carnivores in each weight bin
         """
 
-        countswh = np.histogram(np.hstack(w_herbivores), self._limits_w)[0]
         self._histw_line.set_ydata(countswh)
-        countswc = np.histogram(np.hstack(w_carnivores), self._limits_w)[0]
         self._histw_line_2.set_ydata(countswc)
         self._ymax = max(self._ymax, 1.05 * max(countswh))
         self._histw_ax.set_ylim(0, self._ymax)
 
-    def _update_hist_f(self, f_herbivores, f_carnivores):
+    def _update_hist_f(self, countsfh, countsfc):
         """
-        Updates the histograms of animal weight distribution
+        Updates the histograms of animal fitness distribution
 
-        :param f_herbivores: Nested Array containing the current fitness of herbivores on the island
-        :param f_carnivores: Nested Array containing the current fitness of carnivores on the island
+        :param countsfh: Array with the count of herbivores in each fitness bin
+        :param countsfc: Array with the count of carnivores in each fitness bin
         """
-        countsfh = np.histogram(np.hstack(f_herbivores), self._limits_f)[0]
         self._histf_line.set_ydata(countsfh)
-        countsfc = np.histogram(np.hstack(f_carnivores), self._limits_f)[0]
         self._histf_line_2.set_ydata(countsfc)
         self._ymax = max(self._ymax, 1.05 * max(countsfh))
         self._histf_ax.set_ylim(0, self._ymax)
 
-    def _update_hist_a(self, a_herbivores, a_carnivores):
+    def _update_hist_a(self, countsah, countsac):
         """
-        Updates the histograms of animal weight distribution
+        Updates the histograms of animal age distribution
 
-        :param a_herbivores: Nested Array containing the current age of herbivores on the island
-        :param a_carnivores: Nested Array containing the current age of carnivores on the island
+        :param countsah: Array with the count of herbivores in each age bin
+        :param countsac: Array with the count of carnivores in each age bin
         """
 
-        countsah = np.histogram(np.hstack(a_herbivores), self._limits_a)[0]
         self._hista_line.set_ydata(countsah)
-        countsac = np.histogram(np.hstack(a_carnivores), self._limits_a)[0]
         self._hista_line_2.set_ydata(countsac)
         self._ymax = max(self._ymax, 1.05 * max(countsah))
         self._hista_ax.set_ylim(0, self._ymax)
@@ -175,3 +175,73 @@ def test_stat_prey():
     survivors = test_carnivore.feeding(test_herbivores)
     p_hyp = stats.binom_test(len(survivors), n=50, p=(1 - p))
     assert p_hyp >= 0.05
+
+
+def test_copy_species_own_params():
+    # Test that changing the parameters of a copy leaves the species class untouched.
+    species = herbivore.copy_species()
+    species.update_params({'gamma': 0.9})
+    assert species.gamma == 0.9
+    assert herbivore.gamma != 0.9
+    assert isinstance(species(weight=10, age=1), herbivore)
+
+
+def test_instance_parameter_override():
+    # Test that a parameter set on one animal, also of a copied species, applies to it alone.
+    for species in (herbivore, herbivore.copy_species()):
+        individual = species(weight=10, age=1)
+        individual.F = 5
+        assert individual.feeding(100) == 95
+        assert species(weight=10, age=1).feeding(100) == 90
+        individual.release()
+        assert species.newborn(5, 0) is not individual
+
+
+def test_subclass_without_slots():
+    class tagged(herbivore):
+        pass
+
+    specie = tagged(weight=10, age=1)
+    specie.tag = 'marked'
+    assert specie.tag == 'marked'
+
+
+def test_newborn_reuses_released():
+    species = herbivore.copy_species()
+    dead = species(weight=30, age=20)
+    dead.migrated = True
+    dead.release()
+    child = species.newborn(5, 0)
+    assert child is dead
+    assert (child.weight, child.age, child.migrated) == (5, 0, False)
+    assert species.newborn(5, 0) is not dead
+
+
+def test_fitness_cached_until_change(mocker):
+    individual = herbivore(weight=20, age=5)
+    spy = mocker.spy(herbivore, 'fitness_update')
+    first = individual.fitness
+    assert individual.fitness == first
+    assert spy.call_count == 1
+    individual.weight += 5
+    assert individual.fitness > first
+    assert spy.call_count == 2
+
+
+def test_age_table_cleared_on_update():
+    species = carnivore.copy_species()
+    young = species(weight=20, age=30).fitness
+    species.update_params({'a_half': 20})
+    individual = species(weight=20, age=30)
+    assert individual.fitness < young
+    assert individual.fitness == (1 / (1 + m.e ** (0.3 * (30 - 20)))) * \
+        (1 / (1 + m.e ** (-0.4 * (20 - 4))))
+
+
+def test_cached_fitness_follows_params():
+    species = herbivore.copy_species()
+    individual = species(weight=20, age=5)
+    before = individual.fitness
+    species.update_params({'w_half': 30})
+    assert individual.fitness < before
+    assert individual.fitness == species(weight=20, age=5).fitness
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from biosim.archive import archive_reader, archive_writer
+from biosim.biosim import BioSim
+
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+def _columns(n, value):
+    return {'cell': np.arange(n), 'species': np.zeros(n, dtype=np.int8),
+            'age': np.full(n, value), 'weight': np.full(n, float(value)),
+            'fitness': np.linspace(0, 1, n)}
+
+
+def test_years_across_chunks(tmp_path):
+    writer = archive_writer(tmp_path, chunk_rows=7)
+    for year, n in ((2, 5), (4, 0), (6, 20), (8, 3)):
+        writer.append(year, _columns(n, year))
+    writer.close()
+    reader = archive_reader(tmp_path)
+    assert list(reader.years()) == [2, 4, 6, 8]
+    assert len(reader[4]['cell']) == 0
+    assert np.array_equal(reader[6]['cell'], np.arange(20))
+    assert np.all(reader.read(8, fields=['age'])['age'] == 8)
+    with pytest.raises(KeyError):
+        reader.read(5)
+
+
+def test_append_to_existing_archive(tmp_path):
+    archive_writer(tmp_path, chunk_rows=4).append(1, _columns(3, 1))
+    writer = archive_writer(tmp_path)
+    assert writer.chunk_rows == 4
+    with pytest.raises(ValueError):
+        writer.append(1, _columns(3, 1))
+    writer.append(2, _columns(6, 2))
+    assert np.all(archive_reader(tmp_path)[2]['weight'] == 2)
+
+
+def test_simulation_archive(tmp_path):
+    sim = BioSim("WWWW\nWLHW\nWWWW", ini_pop, seed=1, vis_years=0, engine='array',
+                 archive_dir=tmp_path, archive_years=2)
+    expected = {}
+    for snapshot in sim.iter_years(6, animals=True):
+        expected[snapshot.year] = snapshot.animals
+    reader = archive_reader(tmp_path)
+    assert list(reader.years()) == [2, 4, 6]
+    year = reader[4]
+    for code, species in enumerate(('herbivore', 'carnivore')):
+        for field in ('age', 'weight', 'fitness'):
+            assert np.array_equal(year[field][year['species'] == code],
+                                  expected[4][species][field])
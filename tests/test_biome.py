@@ -1,5 +1,7 @@
 import random as rd
 
+import numpy as np
+
 from biosim.biome import lowland, highland, desert, water
 
 
@@ -107,29 +109,6 @@ def test_grazing():
     assert low_cell.fodder < f_max
 
 
-def test_migration(mocker):
-    a = rd.randint(1, 50)
-    b = rd.randint(1, 50)
-    A = lowland((a, b))
-    B = lowland((a - 1, b))
-    C = highland((a + 1, b))
-    D = water((a, b - 1))
-    E = desert((a, b + 1))
-    cell_lst = [B, C, D, E]
-    pop_size = 20
-    pop = [{'species': 'Carnivore',
-            'age': 5,
-            'weight': 20}
-           for _ in range(pop_size)]
-    A.add_population(pop)
-    mocker.patch('biosim.animals.animal.migration', return_value=True)
-    A.migration(cell_lst)
-    total_pop = len(A.carn) + len(A.herb) + len(B.carn) + len(B.herb) + len(C.carn) + len(C.herb) \
-        + len(D.carn) + len(D.herb) + len(E.carn) + len(E.herb)
-    assert total_pop == pop_size
-    assert len(A.carn) + len(A.herb) < total_pop
-
-
 def test_cell_procreation(mocker):
     # test no babies are born
     a = rd.randint(1, 50)
@@ -213,3 +192,35 @@ def test_animal_parameterupdate_unintended():
     low_cell.add_population(pop)
     low_cell.change_animalparams('Herbivore', ({'beta': 0.5}))
     assert low_cell.herb[0].beta == 0.5
+
+
+def test_aging_and_death():
+    low_cell = lowland((5, 5))
+    pop = [{'species': 'Herbivore',
+            'age': 5,
+            'weight': 20}
+           for _ in range(20)] + \
+          [{'species': 'Carnivore',
+            'age': 50,
+            'weight': 0}
+           for _ in range(20)]
+    low_cell.add_population(pop)
+    low_cell.aging_and_death(np.random.default_rng(1))
+    assert len(low_cell.carn) == 0
+    assert all(specie.age == 6 for specie in low_cell.herb)
+    assert all(specie.weight == 20 - 20 * specie.eta for specie in low_cell.herb)
+
+
+def test_breeding_updates_mother():
+    low_cell = lowland((5, 5))
+    pop = [{'species': 'Carnivore',
+            'age': 5,
+            'weight': 100}
+           for _ in range(20)]
+    low_cell.add_population(pop)
+    low_cell.breeding(np.random.default_rng(1))
+    newborns = low_cell.carn[20:]
+    mothers = [specie for specie in low_cell.carn[:20] if specie.weight < 100]
+    assert len(newborns) == len(mothers) > 0
+    assert all(specie.age == 0 for specie in newborns)
+    assert all(np.isclose(specie.fitness, specie.fitness_update()) for specie in mothers)
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+from biosim import checkpoint
+from biosim.biosim import BioSim
+
+geogr = """\
+           WWWWWW
+           WLLHDW
+           WLHLLW
+           WWWWWW"""
+
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(8)]}]
+
+
+def _new_sim(engine):
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0, engine=engine)
+    sim.set_animal_parameters('Herbivore', {'mu': 0.3})
+    sim.set_landscape_parameters('L', {'f_max': 700})
+    return sim
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'tiled'])
+def test_resume_is_identical(engine, tmp_path):
+    whole = _new_sim(engine)
+    whole.simulate(8)
+
+    first = _new_sim(engine)
+    first.simulate(4)
+    first.save_checkpoint(tmp_path / 'sim.npz')
+    first.island.close()
+    resumed = BioSim.from_checkpoint(tmp_path / 'sim.npz', vis_years=0)
+    assert resumed.year == 4
+    resumed.simulate(4)
+
+    assert np.array_equal(resumed.record.herbivores, whole.record.herbivores)
+    assert np.array_equal(resumed.record.carnivores, whole.record.carnivores)
+    assert np.array_equal(np.array(resumed.island.distrubution()),
+                          np.array(whole.island.distrubution()))
+    for species in ('herbivore', 'carnivore'):
+        expected = whole.island.animal_columns(species)
+        for prop, values in resumed.island.animal_columns(species).items():
+            assert np.array_equal(values, expected[prop])
+    for sim in (whole, resumed):
+        sim.island.close()
+
+
+def test_checkpoint_keeps_parameters(tmp_path):
+    sim = _new_sim('array')
+    sim.save_checkpoint(tmp_path / 'sim.npz')
+    resumed = BioSim.from_checkpoint(tmp_path / 'sim.npz', vis_years=0)
+    assert resumed.island.species['herbivore'].mu == 0.3
+    assert resumed.island.landscape_params['L']['f_max'] == 700
+    assert resumed.num_animals == 48
+
+
+def test_delta_round_trip():
+    sim = _new_sim('array')
+    previous = sim._checkpoint_arrays()
+    previous = {name: np.array(values) for name, values in previous.items()}
+    sim.simulate(2)
+    current = sim._checkpoint_arrays()
+    delta = checkpoint.delta_arrays(previous, current)
+    assert len(delta['herbivore_age']) < len(current['herbivore_age'])
+    assert len(delta['herbivore_fitness']) == 0 and len(delta['carnivore_origin']) == 0
+    assert 'f_max' not in delta
+    assert list(delta['record_years']) == [1, 2]
+    rebuilt = checkpoint.apply_delta(previous, delta)
+    assert rebuilt.keys() == current.keys()
+    for name, values in current.items():
+        assert np.array_equal(rebuilt[name], values)
+
+
+def test_delta_after_parameter_change():
+    sim = _new_sim('array')
+    sim.simulate(1)
+    previous = {name: np.array(values) for name, values in sim._checkpoint_arrays().items()}
+    sim.set_animal_parameters('Herbivore', {'a_half': 20.0, 'eta': 0.1})
+    sim.set_landscape_parameters('L', {'f_max': 500})
+    current = sim._checkpoint_arrays()
+    delta = checkpoint.delta_arrays(previous, current)
+    assert 'f_max' in delta
+    rebuilt = checkpoint.apply_delta(previous, delta)
+    for name, values in current.items():
+        assert np.array_equal(rebuilt[name], values)
+
+
+@pytest.mark.parametrize('engine', ['array', 'tiled'])
+def test_resume_any_year_from_series(engine, tmp_path):
+    whole = _new_sim(engine)
+    whole.simulate(8)
+
+    series = BioSim(geogr, ini_pop, seed=3, vis_years=0, engine=engine,
+                    checkpoint_dir=tmp_path, base_years=3)
+    series.set_animal_parameters('Herbivore', {'mu': 0.3})
+    series.set_landscape_parameters('L', {'f_max': 700})
+    series.simulate(6)
+    series.close()
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert files[:3] == ['base_000001.npz', 'base_000004.npz', 'delta_000002.npz']
+    assert checkpoint.checkpoint_series(tmp_path).years() == [1, 2, 3, 4, 5, 6]
+
+    resumed = BioSim.from_checkpoint(tmp_path, year=3, vis_years=0)
+    assert resumed.year == 3
+    resumed.simulate(5)
+    assert np.array_equal(resumed.record.herbivores, whole.record.herbivores)
+    assert np.array_equal(resumed.record.carnivores, whole.record.carnivores)
+    expected = whole.island.animal_columns('herbivore')
+    for prop, values in resumed.island.animal_columns('herbivore').items():
+        assert np.array_equal(values, expected[prop])
+    for sim in (whole, resumed):
+        sim.close()
+
+
+def test_tiled_ids_unique_after_resume(tmp_path):
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0, engine='tiled', tiles=2)
+    sim.simulate(3)
+    sim.save_checkpoint(tmp_path / 'sim.npz')
+    sim.close()
+    resumed = BioSim.from_checkpoint(tmp_path / 'sim.npz', vis_years=0, tiles=3)
+    resumed.simulate(3)
+    arrays = resumed._checkpoint_arrays()
+    resumed.close()
+    for species in ('herbivore', 'carnivore'):
+        ids = arrays[species + '_id']
+        assert len(np.unique(ids)) == len(ids)
+        assert len(arrays[species + '_next_id']) == 3
+
+
+def test_object_series_holds_bases(tmp_path):
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0, checkpoint_dir=tmp_path, base_years=3)
+    sim.simulate(3)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'base_000001.npz', 'base_000002.npz', 'base_000003.npz']
+
+
+def test_resume_rejects_saved_settings(tmp_path):
+    _new_sim('array').save_checkpoint(tmp_path / 'sim.npz')
+    with pytest.raises(ValueError):
+        BioSim.from_checkpoint(tmp_path / 'sim.npz', vis_years=0, engine='object')
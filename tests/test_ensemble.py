@@ -0,0 +1,53 @@
+import numpy as np
+
+from biosim.biosim import BioSim
+from biosim.ensemble import run_ensemble, running_stats
+
+geogr = "WWWW\nWLHW\nWWWW"
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                      for _ in range(30)]}]
+ini_carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                      for _ in range(5)]}]
+
+
+def test_running_stats():
+    values = np.random.default_rng(1).normal(size=(20, 3))
+    stats = running_stats(3)
+    for row in values:
+        stats.update(row)
+    assert np.allclose(stats.mean, values.mean(axis=0))
+    assert np.allclose(stats.variance, values.var(axis=0, ddof=1))
+
+
+def test_ensemble_matches_biosim():
+    result = run_ensemble(geogr, ini_herbs, seeds=[1, 2], num_years=6, events={3: ini_carns},
+                          processes=1)
+    sim = BioSim(geogr, ini_herbs, seed=2, vis_years=0)
+    sim.simulate(3)
+    sim.add_population(ini_carns)
+    sim.simulate(3)
+    counts = sim.num_animals_per_species
+    assert list(result.counts[2][-1]) == [counts['Herbivore'], counts['Carnivore']]
+    assert result.counts[2][3, 1] == 0
+    assert result.counts[2][4, 1] > 0
+
+
+def test_ensemble_in_process_pool():
+    serial = run_ensemble(geogr, ini_herbs, seeds=[1, 2, 3], num_years=5, processes=1)
+    pooled = run_ensemble(geogr, ini_herbs, seeds=[1, 2, 3], num_years=5, processes=2)
+    for seed in (1, 2, 3):
+        assert np.array_equal(serial.counts[seed], pooled.counts[seed])
+    assert np.allclose(serial.mean, pooled.mean)
+    assert pooled.mean.shape == (6, 2)
+
+
+def test_ensemble_with_extinct_replicate():
+    carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+    result = run_ensemble('WWW\nWDW\nWWW', carns, seeds=[1, 2], num_years=30, processes=1)
+    assert result.mean.shape == (31, 2)
+    for counts in result.counts.values():
+        assert counts.shape == (31, 2)
+        assert np.all(counts[-1] == 0)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from biosim.histograms import histogram_collector
+from biosim.island import island
+
+hist_specs = {'weight': {'max': 60, 'delta': 2},
+              'fitness': {'max': 1.0, 'delta': 0.05},
+              'age': {'max': 60.0, 'delta': 2}}
+
+
+def test_count_matches_histogram():
+    collector = histogram_collector(hist_specs)
+    values = np.random.default_rng(1).uniform(-5, 70, 10000)
+    expected = np.histogram(values, collector.edges('weight'))[0]
+    assert np.array_equal(collector.count(values, 'weight'), expected)
+
+
+def test_unknown_property():
+    with pytest.raises(ValueError):
+        histogram_collector({'height': {'max': 2, 'delta': 0.1}})
+
+
+def test_carnivores_without_herbivores_counted():
+    isl = island("WWWW\nWLHW\nWWWW")
+    isl.add_population([{'loc': (2, 2),
+                         'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                                 for _ in range(7)]}])
+    histograms = histogram_collector(hist_specs).collect(isl)
+    assert histograms['carnivore']['weight'].sum() == 7
+    assert histograms['carnivore']['age'][2] == 7
+    assert histograms['herbivore']['fitness'].sum() == 0
+
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_collect_counts_every_animal(engine):
+    isl = island("WWWWW\nWLLHW\nWWWWW", engine=engine, seed=1)
+    isl.add_population([{'loc': (2, c),
+                         'pop': [{'species': 'Herbivore', 'age': a, 'weight': 10 + a}
+                                 for a in range(20)]} for c in (2, 3, 4)])
+    histograms = histogram_collector(hist_specs).collect(isl)
+    for prop in hist_specs:
+        assert histograms['herbivore'][prop].sum() == 60
@@ -0,0 +1,115 @@
+import pytest
+
+from biosim.animals import carnivore
+from biosim.biome import biome, highland, lowland
+from biosim.island import island
+
+
+def test_object_migration_moves_animals():
+    isl = island("WWWWW\nWLLLW\nWLLLW\nWLLLW\nWWWWW", seed=1)
+    isl.add_population([{'loc': (3, 3),
+                         'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 50}
+                                 for _ in range(100)]}])
+    isl.migration()
+    assert isl.animal_count() == 100
+    assert 0 < len(isl.coord_map[2][2].carn) < 100
+    assert all(specie.migrated for cell in isl.cells for specie in cell.carn
+               if cell is not isl.coord_map[2][2])
+
+
+def test_only_occupied_cells_visited(mocker):
+    spy = mocker.spy(biome, 'grazing')
+    isl = island("WWWW\nWLHW\nWWWW")
+    isl.add_population([{'loc': (2, 3),
+                         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+    isl.sim_year()
+    assert spy.call_count == 1
+    assert spy.call_args[0][0] is isl.coord_map[1][2]
+
+
+def test_water_placement_rejected():
+    isl = island("WWW\nWLW\nWWW")
+    with pytest.raises(ValueError):
+        isl.add_population([{'loc': (1, 1),
+                             'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+
+
+def test_dead_cells_leave_schedule():
+    isl = island("WWWW\nWLHW\nWWWW")
+    isl.add_population([{'loc': (2, 2),
+                         'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 0}]}])
+    isl.sim_year()
+    assert isl.animal_count() == 0
+    assert len(isl._active) == 0
+
+
+def test_fodder_grid_regrowth():
+    isl = island("WWWW\nWLHW\nWWWW")
+    isl.coord_map[1][1].fodder = 3
+    assert isl.fodder[1, 1] == 3
+    isl.update_fodder()
+    assert isl.coord_map[1][1].fodder == isl.f_max[1, 1] == isl.landscape_params['L']['f_max']
+
+
+def test_landscape_params_per_island():
+    first = island("WWWW\nWLHW\nWWWW")
+    second = island("WWWW\nWLHW\nWWWW")
+    first.change_landscapeparams('H', {'f_max': 123.})
+    assert first.f_max[1, 2] == 123
+    assert second.f_max[1, 2] == highland.f_max
+
+
+def test_cell_override():
+    isl = island("WWWWW\nWLLLW\nWWWWW")
+    isl.change_cellparams((2, 3), {'f_max': 5.})
+    isl.update_fodder()
+    assert list(isl.fodder[1, 1:4]) == [lowland.f_max, 5, lowland.f_max]
+    with pytest.raises(KeyError):
+        isl.change_cellparams((1, 1), {'f_max': 5.})
+
+
+def test_cell_override_kept_after_landscape_change():
+    isl = island("WWWWW\nWLLLW\nWWWWW")
+    isl.change_cellparams((2, 3), {'f_max': 5.})
+    isl.change_landscapeparams('L', {'f_max': 300.})
+    assert list(isl.f_max[1, 1:4]) == [300, 5, 300]
+
+
+def test_animal_params_per_island():
+    first = island("WWW\nWLW\nWWW")
+    second = island("WWW\nWLW\nWWW")
+    first.change_animalparams('Carnivore', {'F': 5.})
+    first.add_population([{'loc': (2, 2),
+                           'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}]}])
+    assert first.coord_map[1][1].carn[0].F == 5
+    assert second.species['carnivore'].F == carnivore.F != 5
+
+
+def test_counters_follow_cells():
+    # Test that the kept counts match a walk over the cells after births, deaths and moves.
+    isl = island("WWWWW\nWLLLW\nWLHLW\nWWWWW", seed=2)
+    isl.add_population([{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                 for _ in range(40)]
+                         + [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                            for _ in range(10)]}])
+    herb, carn = isl.distrubution()
+    for _ in range(10):
+        isl.sim_year()
+        assert [[len(cell.herb) for cell in row] for row in isl.coord_map] == herb.tolist()
+        assert [[len(cell.carn) for cell in row] for row in isl.coord_map] == carn.tolist()
+        assert isl.species_count() == {'Herbivore': herb.sum(), 'Carnivore': carn.sum()}
+    assert isl.distrubution()[0] is herb
+
+
+def test_array_population_added_at_once(mocker):
+    # Test that all entries are added with one store update per species, in the given order.
+    isl = island("WWWWW\nWLLLW\nWLHLW\nWWWWW", engine='array')
+    add = mocker.spy(isl.herb, 'add')
+    herbivores = [{'loc': (loc, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': weight}]}
+                  for loc, weight in ((3, 10), (2, 20), (2, 30))]
+    isl.add_population(herbivores)
+    assert add.call_count == 1
+    assert isl.herb.weight.tolist() == [20, 30, 10]
+    assert isl.distrubution()[0].sum() == 3 and isl.distrubution()[0][1, 1] == 2
+    assert isl.species_count() == {'Herbivore': 3, 'Carnivore': 0}
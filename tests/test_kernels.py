@@ -0,0 +1,108 @@
+import numpy as np
+
+from biosim import kernels
+from biosim.animals import herbivore, carnivore
+
+
+def test_fitness_matches_object():
+    weight = np.array([0., 5., 20., 60.])
+    age = np.array([100, 3, 10, 1])
+    expected = [herbivore(weight=w, age=a).fitness for w, a in zip(weight, age)]
+    assert np.allclose(kernels.fitness(weight, age, herbivore), expected)
+
+
+def test_fitness_no_overflow_warning():
+    with np.errstate(over='raise'):
+        assert kernels.fitness(np.array([10.]), np.array([5000]), carnivore)[0] == 0
+
+
+def test_aging_death():
+    weight = np.array([50., 0.])
+    age = np.array([2, 2])
+    new_weight, new_age, fitness, alive = kernels.aging_death(weight, age, herbivore,
+                                                              np.random.default_rng(1))
+    assert list(new_age) == [3, 3]
+    assert new_weight[0] == 50 - 50 * herbivore.eta
+    assert not alive[1]
+
+
+def test_breeding_needs_two_animals():
+    weight = np.array([100.])
+    mothers, newborn = kernels.breeding(weight, np.array([1.]), 1, carnivore,
+                                        np.random.default_rng(1))
+    assert len(mothers) == 0
+
+
+def test_breeding_newborns():
+    weight = np.full(50, 100.)
+    fitness = np.ones(50)
+    mothers, newborn = kernels.breeding(weight, fitness, 50, carnivore,
+                                        np.random.default_rng(1))
+    assert len(mothers) == len(newborn) > 0
+    assert np.all(newborn > 0)
+    assert np.all(carnivore.xi * newborn < weight[mothers])
+
+
+class certain_hunter(carnivore):
+    # Carnivore which always catches weaker prey
+    DeltaPhiMax = 1e-9
+
+
+def test_hunting_stops_at_appetite():
+    prey_weight = np.full(10, 20.)
+    prey_fitness = np.linspace(0.1, 0.5, 10)[::-1]
+    weight, alive = kernels.hunting(np.array([30.]), np.array([0.9]), prey_weight,
+                                    prey_fitness, certain_hunter, np.random.default_rng(1))
+    # Appetite of 50 is met after the three weakest herbivores
+    assert list(alive) == [True] * 7 + [False] * 3
+    assert weight[0] == 30 + 3 * 20 * certain_hunter.beta
+
+
+def test_hunting_only_weaker_prey():
+    prey_fitness = np.array([0.2, 0.6, 0.8])
+    weight, alive = kernels.hunting(np.array([30., 30.]), np.array([0.4, 0.7]),
+                                    np.full(3, 1.), prey_fitness, certain_hunter,
+                                    np.random.default_rng(1))
+    # The fittest carnivore hunts first and eats both herbivores weaker than itself
+    assert list(alive) == [False, False, True]
+    assert list(weight) == [30, 30 + 2 * certain_hunter.beta]
+
+
+def test_grazing_shares_fodder():
+    cell = np.array([0, 1, 0, 1, 0])
+    eaten, left = kernels.grazing(cell, np.array([25., 100.]), herbivore,
+                                  np.random.default_rng(1))
+    # Cell 0: two herbivores eat fully and one gets the remaining 5, cell 1 has plenty.
+    assert sorted(eaten[cell == 0]) == [5, 10, 10]
+    assert list(eaten[cell == 1]) == [10, 10]
+    assert list(left) == [0, 80]
+
+
+def test_grazing_order_reproducible():
+    cell = np.zeros(10, dtype=int)
+    fodder = np.array([35.])
+    first, _ = kernels.grazing(cell, fodder, herbivore, np.random.default_rng(3))
+    second, _ = kernels.grazing(cell, fodder, herbivore, np.random.default_rng(3))
+    assert list(first) == list(second)
+
+
+def test_neighbour_table():
+    habitable = np.array([[False, False, False],
+                          [False, True, True],
+                          [False, False, False]])
+    neighbours = kernels.neighbour_table(habitable)
+    assert list(neighbours[4]) == [-1, -1, 5, -1]
+    assert list(neighbours[5]) == [4, -1, -1, -1]
+    assert list(neighbours[0]) == [-1, -1, -1, -1]
+
+
+def test_migration_to_habitable_neighbours():
+    habitable = np.ones((3, 3), dtype=bool)
+    neighbours = kernels.neighbour_table(habitable)
+    cell = np.full(100, 4)
+    migrated = np.zeros(100, dtype=bool)
+    migrated[:50] = True
+    movers, target = kernels.migration(cell, np.ones(100), migrated, carnivore, neighbours,
+                                       np.random.default_rng(1))
+    assert np.all(movers >= 50)
+    assert set(target) <= {1, 3, 5, 7}
@@ -0,0 +1,110 @@
+import numpy as np
+
+from biosim import kernels
+from biosim.animals import herbivore, carnivore
+from biosim.island import island
+from biosim.population import population_store
+from biosim.biosim import BioSim
+
+
+def test_add_keeps_cell_order():
+    # Test that animals are sorted by cell, and new animals come after old ones in a cell.
+    store = population_store(herbivore, (3, 3))
+    store.add([4, 1], [10, 20], [1, 2])
+    store.add([1], [30], [3])
+    assert list(store.cell) == [1, 1, 4]
+    assert list(store.weight) == [20, 30, 10]
+    assert len(store) == 3
+
+
+def test_fitness_matches_object():
+    # Test that the vectorized fitness equals the fitness of the animal objects.
+    store = population_store(carnivore, (3, 3))
+    store.add([4, 4, 4], [0, 5, 40], [3, 10, 50])
+    expected = [carnivore(weight=w, age=a).fitness for w, a in [(0, 3), (5, 10), (40, 50)]]
+    assert np.allclose(store.fitness, expected)
+
+
+def test_aging_death():
+    store = population_store(herbivore, (3, 3))
+    store.add([4], [50], [2])
+    store.migrated[:] = True
+    store.aging_death(np.random.default_rng(1))
+    assert store.age[0] == 3
+    assert store.weight[0] == 50 - 50 * herbivore.eta
+    assert not store.migrated[0]
+
+
+def test_aging_death_removes_dead():
+    store = population_store(carnivore, (3, 3))
+    store.add([4] * 20, [0] * 20, [50] * 20)
+    store.aging_death(np.random.default_rng(1))
+    assert len(store) == 0
+
+
+def test_breeding():
+    store = population_store(carnivore, (3, 3))
+    store.add([4] * 20, [100] * 20, [5] * 20)
+    store.breeding(np.random.default_rng(1))
+    assert len(store) > 20
+    assert np.all(store.age[20:] == 0)
+
+
+def test_migration_only_to_habitable():
+    store = population_store(carnivore, (3, 3))
+    store.add([4] * 50, [500] * 50, [2] * 50)
+    habitable = np.zeros((3, 3), dtype=bool)
+    habitable[1, 1:] = True
+    store.migration(kernels.neighbour_table(habitable), np.random.default_rng(1))
+    assert set(store.cell) <= {4, 5}
+    assert np.all(store.migrated[store.cell == 5])
+
+
+def test_grazing_eats_fodder():
+    isl = island("WWW\nWLW\nWWW", engine='array', seed=1)
+    isl.add_population([{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                 for _ in range(100)]}])
+    isl.herb.grazing(isl.fodder.reshape(-1), np.random.default_rng(1))
+    assert isl.fodder[1, 1] == 0
+    assert np.sum(isl.herb.weight > 20) == isl.f_max[1, 1] // herbivore.F
+
+
+def test_hunting_removes_prey():
+    isl = island("WWW\nWLW\nWWW", engine='array', seed=1)
+    isl.add_population([{'loc': (2, 2),
+                         'pop': ([{'species': 'Herbivore', 'age': 300, 'weight': 10}
+                                  for _ in range(10)]
+                                 + [{'species': 'Carnivore', 'age': 2, 'weight': 50}])}])
+    isl.carn.hunting(isl.herb, np.random.default_rng(1))
+    assert len(isl.herb) < 10
+    assert isl.carn.weight[0] > 50
+
+
+def test_array_engine_simulation():
+    # Test that the array engine runs and keeps the counts in step with the stores.
+    sim = BioSim(island_map="WWWW\nWLHW\nWWWW",
+                 ini_pop=[{'loc': (2, 2),
+                           'pop': ([{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                    for _ in range(50)]
+                                   + [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                                      for _ in range(5)])}],
+                 seed=1, vis_years=0, engine='array')
+    sim.simulate(10)
+    counts = sim.num_animals_per_species
+    assert sim.num_animals == counts['Herbivore'] + counts['Carnivore']
+    herb, carn = sim.island.distrubution()
+    assert np.sum(herb) == counts['Herbivore']
+    assert np.sum(carn) == counts['Carnivore']
+
+
+def test_split_and_merge():
+    store = population_store(herbivore, (3, 3))
+    store.add([4, 1, 4], [10, 20, 30], [1, 2, 3])
+    store.migrated[:] = True
+    columns = store.split(store.cell == 4)
+    assert list(store.weight) == [20]
+    assert list(columns['weight']) == [10, 30]
+    store.merge(columns)
+    assert list(store.cell) == [1, 4, 4]
+    assert np.all(store.migrated)
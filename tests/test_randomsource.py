@@ -0,0 +1,53 @@
+import numpy as np
+
+from biosim.island import island
+from biosim.randomsource import random_source
+
+
+def test_source_reproducible():
+    first = random_source(5)
+    second = random_source(5)
+    assert [first.uniform() for _ in range(100)] == [second.uniform() for _ in range(100)]
+    assert [first.normal() for _ in range(10)] == [second.normal() for _ in range(10)]
+
+
+def test_source_distribution():
+    source = random_source(1, block=1000)
+    uniform = np.array([source.uniform() for _ in range(20000)])
+    normal = np.array([source.gauss(8, 1.5) for _ in range(20000)])
+    assert 0 <= uniform.min() and uniform.max() < 1
+    assert abs(uniform.mean() - 0.5) < 0.01
+    assert abs(normal.mean() - 8) < 0.05 and abs(normal.std() - 1.5) < 0.05
+
+
+def test_state_roundtrip():
+    # Test that a source moved to a recorded state continues with the same numbers,
+    # also across the end of a block.
+    source = random_source(3, block=16)
+    for _ in range(10):
+        source.uniform()
+    source.normal()
+    state = source.get_state()
+    expected = [source.uniform() for _ in range(40)] + [source.normal() for _ in range(40)]
+
+    restored = random_source(99, block=16)
+    restored.set_state(state)
+    assert [restored.uniform() for _ in range(40)] + \
+        [restored.normal() for _ in range(40)] == expected
+
+
+def test_state_of_unused_source():
+    source = random_source(3)
+    restored = random_source(4)
+    restored.set_state(source.get_state())
+    assert restored.uniform() == source.uniform()
+
+
+def test_island_seeds_animal_source():
+    # Test that the animals of two islands with the same seed make the same decisions.
+    decisions = []
+    for _ in range(2):
+        isl = island("WWW\nWLW\nWWW", seed=8)
+        herb = isl.species['herbivore'](20, 5)
+        decisions.append([herb.death() for _ in range(50)])
+    assert decisions[0] == decisions[1]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from biosim.biosim import BioSim
+from biosim.island import island
+from biosim.record import year_record
+
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)]}]
+
+
+def test_record_grows():
+    isl = island("WWWW\nWLHW\nWWWW")
+    isl.add_population(ini_pop)
+    record = year_record(isl.shape, density=True, capacity=2)
+    for year in range(9):
+        record.append(year, isl)
+    assert len(record) == 9
+    assert np.all(record.years == np.arange(9))
+    assert np.all(record.herbivores == 30)
+    assert np.all(record.totals == 30)
+    assert record.density.shape == (9, 2, 3, 4)
+    assert np.all(record.density[:, 0, 1, 1] == 30)
+
+
+def test_density_needs_shape():
+    with pytest.raises(ValueError):
+        year_record(density=True)
+
+
+def test_headless_simulation():
+    sim = BioSim("WWWW\nWLHW\nWWWW", ini_pop, seed=1, vis_years=0, record_density=True)
+    assert sim.graphs is None
+    record = sim.simulate(5)
+    record = sim.simulate(3)
+    assert list(record.years) == list(range(9))
+    assert record.totals[-1] == sim.num_animals
+    counts = np.stack((record.herbivores, record.carnivores), axis=1)
+    assert np.all(record.density.sum(axis=(2, 3)) == counts)
+    with pytest.raises(RuntimeError):
+        sim.make_movie('mp4')
+
+
+def test_iter_years():
+    sim = BioSim("WWWW\nWLHW\nWWWW", ini_pop, seed=1, vis_years=0)
+    snapshots = []
+    for snapshot in sim.iter_years(10, density=True, stats=True, animals=True):
+        snapshots.append(snapshot)
+        if snapshot.year == 4:
+            break
+    assert sim.year == 4
+    assert [snapshot.year for snapshot in snapshots] == [1, 2, 3, 4]
+    last = snapshots[-1]
+    assert last.herbivores == sim.num_animals_per_species['Herbivore']
+    assert last.density[0].sum() == last.herbivores
+    assert last.stats['Herbivore']['weight'].count == last.herbivores
+    assert len(last.animals['herbivore']['weight']) == last.herbivores
+
+
+def test_iter_years_lightweight():
+    sim = BioSim("WWWW\nWLHW\nWWWW", ini_pop, seed=1, vis_years=0)
+    snapshot = next(sim.iter_years(3))
+    assert snapshot.density is None and snapshot.stats is None and snapshot.animals is None
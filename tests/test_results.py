@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from biosim.biosim import BioSim
+from biosim.island import island
+from biosim.results import load_results, results_writer
+
+geogr = "WWWWW\nWLHDW\nWWWWW"
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]},
+           {'loc': (2, 3),
+            'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(4)]}]
+
+
+@pytest.mark.parametrize('name', ['counts.csv', 'counts.npy'])
+def test_blocks_are_written(tmp_path, name):
+    isl = island(geogr)
+    isl.add_population(ini_pop)
+    writer = results_writer(tmp_path / name, isl, landscapes=True, flush_years=3)
+    for year in range(1, 8):
+        writer.append(year, isl)
+        assert writer.n_written == 3 * (year // 3)
+    writer.flush()
+    results = load_results(tmp_path / name)
+    assert list(results['year']) == list(range(1, 8))
+    assert np.all(results['total'] == 24)
+    assert np.all(results['herbivores_L'] == 20)
+    assert np.all(results['carnivores_H'] == 4)
+    assert np.all(results['herbivores_D'] == 0)
+
+
+def test_simulation_log(tmp_path):
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, log_file=tmp_path / 'log.csv',
+                 log_flush_years=4)
+    sim.simulate(6)
+    sim.simulate(3)
+    results = load_results(tmp_path / 'log.csv')
+    assert list(results['year']) == list(range(1, 10))
+    assert np.array_equal(results['herbivores'], sim.record.herbivores[1:])
+    assert np.array_equal(results['carnivores'], sim.record.carnivores[1:])
+    assert 'herbivores_L' not in results.dtype.names
+
+
+@pytest.mark.parametrize('name', ['log.csv', 'log.npy'])
+def test_resumed_simulation_appends_to_log(tmp_path, name):
+    whole = BioSim(geogr, ini_pop, seed=1, vis_years=0, engine='array')
+    whole.simulate(8)
+    first = BioSim(geogr, ini_pop, seed=1, vis_years=0, engine='array', log_file=tmp_path / name,
+                   log_landscapes=True, checkpoint_dir=tmp_path / 'checkpoints')
+    first.simulate(6)
+    resumed = BioSim.from_checkpoint(tmp_path / 'checkpoints', year=3, vis_years=0,
+                                     log_file=tmp_path / name, log_landscapes=True)
+    resumed.simulate(5)
+    results = load_results(tmp_path / name)
+    assert list(results['year']) == list(range(1, 9))
+    assert np.array_equal(results['herbivores'], whole.record.herbivores[1:])
+    assert np.array_equal(results['carnivores'], whole.record.carnivores[1:])
+    assert 'herbivores_L' in results.dtype.names
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from biosim.biosim import BioSim
+from biosim.island import island
+from biosim.sketches import kll_sketch, merge_population_sketches, population_sketches
+
+
+def test_quantiles_within_rank_error():
+    values = np.random.default_rng(1).normal(size=200000)
+    sketch = kll_sketch(200)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    for q in (0.01, 0.25, 0.5, 0.9):
+        rank = np.mean(values <= sketch.quantile(q))
+        assert abs(rank - q) < 0.02
+    assert sketch.count == len(values)
+    assert np.isclose(sketch.mean, values.mean())
+    assert len(sketch) < 1000
+
+
+def test_small_updates_within_documented_error():
+    values = np.random.default_rng(3).lognormal(size=1000000)
+    sketch = kll_sketch(200, seed=3)
+    for chunk in np.array_split(values, 100000):
+        sketch.update(chunk)
+    for q in (0.05, 0.5, 0.95):
+        rank = np.mean(values <= sketch.quantile(q))
+        assert abs(rank - q) < 1.7 / 200
+    assert len(sketch) < 3 * 200 + 100
+
+
+def test_many_merges_within_documented_error():
+    values = np.random.default_rng(4).lognormal(size=1000000)
+    sketches = []
+    for seed, part in enumerate(np.array_split(values, 200)):
+        sketches.append(kll_sketch(200, seed=seed))
+        sketches[-1].update(part)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged = merged.merge(sketch)
+    assert merged.count == len(values)
+    for q in (0.05, 0.5, 0.95):
+        rank = np.mean(values <= merged.quantile(q))
+        assert abs(rank - q) < 1.7 / 200
+    assert len(merged) < 3 * 200 + 100
+
+
+def test_merge():
+    rng = np.random.default_rng(2)
+    first, second = kll_sketch(), kll_sketch()
+    first.update(rng.uniform(0, 1, 50000))
+    second.update(rng.uniform(1, 3, 50000))
+    merged = first.merge(second)
+    assert merged.count == 100000
+    assert merged.min >= 0 and merged.max <= 3
+    assert abs(merged.quantile(0.5) - 1) < 0.05
+
+
+def test_merge_keeps_source_generator():
+    first, second = kll_sketch(8, seed=1), kll_sketch(8, seed=2)
+    for chunk in np.array_split(np.arange(1000.0), 200):
+        first.update(chunk)
+        second.update(chunk)
+    state = first._rng.bit_generator.state
+    merged = first.merge(second)
+    assert len(merged) < len(first) + len(second)
+    assert first._rng.bit_generator.state == state
+
+
+def test_population_sketches_reproducible():
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': weight}
+                                       for weight in range(1, 300)]}]
+    sketches = []
+    for _ in range(2):
+        isl = island("WWWW\nWLHW\nWWWW", seed=4)
+        isl.add_population(ini_pop)
+        sketches.append(population_sketches(isl, k=8)['Herbivore']['weight'])
+    quantiles = np.linspace(0, 1, 21)
+    assert np.array_equal(sketches[0].quantile(quantiles), sketches[1].quantile(quantiles))
+
+
+def test_empty_sketch():
+    assert np.isnan(kll_sketch().quantile(0.5))
+    assert np.isnan(kll_sketch().mean)
+
+
+def test_population_stats():
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+    sims = [BioSim("WWWW\nWLHW\nWWWW", ini_pop, seed=seed, vis_years=0, stats_years=2)
+            for seed in (1, 2)]
+    for sim in sims:
+        sim.simulate(4)
+    initial = sims[0].population_stats(0)
+    assert initial['Herbivore']['age'].quantile(0.5) == 5
+    assert initial['Carnivore']['weight'].count == 0
+    assert sims[0].population_stats(4)['Herbivore']['weight'].count == \
+        sims[0].num_animals_per_species['Herbivore']
+    merged = merge_population_sketches(sims[0].population_stats(4), sims[1].population_stats(4))
+    assert merged['Herbivore']['age'].count == sum(sim.num_animals for sim in sims)
+    with pytest.raises(KeyError):
+        sims[0].population_stats(3)
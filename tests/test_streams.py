@@ -0,0 +1,64 @@
+import numpy as np
+
+from biosim.island import island
+from biosim.streams import random_streams
+
+geogr = "WWWWWWW\nWLLHLLW\nWLLLLDW\nWHLLLLW\nWLLDLLW\nWLLLLLW\nWWWWWWW"
+ini_pop = [{'loc': (3, 3),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 30} for _ in range(150)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 30} for _ in range(20)]}]
+
+
+def test_streams_reproducible():
+    cell = np.array([0, 0, 3, 3, 3])
+    first = random_streams(7).phase(2, 'breeding', 'herbivore').animals(cell).random(5)
+    second = random_streams(7).phase(2, 'breeding', 'herbivore').animals(cell).random(5)
+    other = random_streams(8).phase(2, 'breeding', 'herbivore').animals(cell).random(5)
+    assert np.array_equal(first, second)
+    assert not np.array_equal(first, other)
+
+
+def test_species_streams_differ():
+    cell = np.array([4, 4, 4])
+    streams = random_streams(7)
+    for phase in ('breeding', 'migration', 'aging_death'):
+        herb = streams.phase(1, phase, 'herbivore').animals(cell).random(3)
+        carn = streams.phase(1, phase, 'carnivore').animals(cell).random(3)
+        assert not np.any(herb == carn)
+
+
+def test_animal_streams_independent_of_other_cells():
+    # Test that the draws of a cell do not change when animals of other cells are left out.
+    phase = random_streams(7).phase(1, 'migration', 'herbivore')
+    everyone = phase.animals(np.array([0, 2, 2, 5])).random(4)
+    alone = phase.animals(np.array([2, 2])).random(2)
+    assert np.array_equal(everyone[1:3], alone)
+
+
+def test_streams_uniform():
+    draws = random_streams(1).phase(1, 'grazing', 'herbivore').cell(4).random(100000)
+    assert 0 <= draws.min() and draws.max() < 1
+    assert abs(draws.mean() - 0.5) < 0.01
+    normal = random_streams(1).phase(1, 'breeding', 'herbivore').animals(
+        np.zeros(100000, dtype=int))
+    assert abs(normal.normal(8, 1.5, 100000).std() - 1.5) < 0.05
+
+
+def run(engine, **kwargs):
+    isl = island(geogr, engine=engine, seed=3, **kwargs)
+    isl.add_population(ini_pop)
+    distributions = []
+    for _ in range(6):
+        isl.sim_year()
+        distributions.append(np.array(isl.distrubution()))
+    weights = isl.animal_columns('herbivore')['weight']
+    isl.close()
+    return distributions, weights
+
+
+def test_same_result_for_any_number_of_tiles():
+    expected, weights = run('array')
+    for tiles in (1, 2, 5):
+        distributions, tile_weights = run('tiled', tiles=tiles)
+        assert np.array_equal(distributions, expected)
+        assert np.array_equal(tile_weights, weights)
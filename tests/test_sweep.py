@@ -0,0 +1,63 @@
+import numpy as np
+
+from biosim.ensemble import run_replicate
+from biosim.sweep import grid_design, random_design, param_hash, results_store, run_sweep
+
+geogr = "WWWW\nWLHW\nWWWW"
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                      for _ in range(30)]}]
+
+
+def test_grid_design():
+    design = grid_design({'Herbivore': {'zeta': [3, 4], 'xi': [1.1, 1.2, 1.3]},
+                          'L': {'f_max': [500]}})
+    assert len(design) == 6
+    assert {'Herbivore': {'zeta': 4.0, 'xi': 1.3}, 'L': {'f_max': 500.0}} in design
+
+
+def test_random_design():
+    design = random_design({'Carnivore': {'F': (10, 20)}}, 50, seed=1)
+    values = [params['Carnivore']['F'] for params in design]
+    assert len(values) == 50
+    assert 10 <= min(values) <= max(values) <= 20
+
+
+def test_param_hash_order_independent():
+    assert param_hash({'L': {'f_max': 1.0}, 'Herbivore': {'xi': 1.0, 'zeta': 2.0}}) == \
+        param_hash({'Herbivore': {'zeta': 2.0, 'xi': 1.0}, 'L': {'f_max': 1.0}})
+
+
+def test_store_roundtrip(tmp_path):
+    store = results_store(str(tmp_path))
+    params = {'H': {'f_max': 100.0}}
+    store.save(params, 3, np.arange(6).reshape(3, 2))
+    assert store.has(params, 3)
+    assert not store.has(params, 4)
+    assert np.array_equal(store.load(params, 3), np.arange(6).reshape(3, 2))
+    assert store.keys() == {param_hash(params): params}
+
+
+def test_replicate_fills_zeros_after_extinction():
+    counts = run_replicate(geogr, ini_herbs, seed=1, num_years=100,
+                           animal_params={'Herbivore': {'omega': 1.0, 'eta': 1.0}})
+    assert counts.shape == (101, 2)
+    assert np.all(counts[-50:] == 0)
+
+
+def test_replicate_stops_on_bound():
+    counts = run_replicate(geogr, ini_herbs, seed=1, num_years=100, max_animals=40,
+                           animal_params={'Herbivore': {'eta': 0.05, 'beta': 0.9, 'mu': 0.25}},
+                           landscape_params={'L': {'f_max': 800}, 'H': {'f_max': 300}})
+    assert counts[-1].sum() > 40
+    assert np.all(counts[:-1].sum(axis=1) <= 40)
+
+
+def test_run_sweep(tmp_path):
+    design = grid_design({'Herbivore': {'gamma': [0.1, 0.3]}})
+    store = run_sweep(geogr, ini_herbs, design, seeds=[1, 2], num_years=4,
+                      path=str(tmp_path), processes=2)
+    assert len(store.keys()) == 2
+    for params in design:
+        for seed in (1, 2):
+            assert store.load(params, seed).shape == (5, 2)
@@ -0,0 +1,126 @@
+import multiprocessing
+import socket
+
+import numpy as np
+import pytest
+
+from biosim.biosim import BioSim
+from biosim.island import island
+from biosim.tiles import serve_tile, split_rows, socket_transport
+
+geogr = "WWWWWW\nWLLLLW\nWLLLLW\nWLLLLW\nWLLLLW\nWWWWWW"
+ini_pop = [{'loc': (3, 3),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40} for _ in range(200)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 40} for _ in range(20)]}]
+
+
+def test_split_rows():
+    habitable = np.ones((10, 4), dtype=bool)
+    habitable[[0, -1]] = False
+    rows = split_rows(habitable, 4)
+    assert rows[0][0] == 0 and rows[-1][1] == 10
+    assert all(start < end for start, end in rows)
+    assert all(rows[i][1] == rows[i + 1][0] for i in range(3))
+
+
+def test_split_rows_too_many_tiles():
+    with pytest.raises(ValueError):
+        split_rows(np.ones((3, 3), dtype=bool), 4)
+
+
+@pytest.mark.parametrize('transport', ['queue', socket_transport()])
+def test_tiles_exchange_migrants(transport):
+    # Test that no animal is lost or made when animals migrate across the tile borders.
+    isl = island(geogr, engine='tiled', seed=1, tiles=3, transport=transport)
+    try:
+        for species in ('Herbivore', 'Carnivore'):
+            isl.change_animalparams(species, {'omega': 0, 'gamma': 0, 'eta': 0, 'mu': 1})
+        isl.change_animalparams('Carnivore', {'F': 0})
+        isl.add_population(ini_pop)
+        for _ in range(3):
+            isl.sim_year()
+        assert isl.species_count() == {'Herbivore': 200, 'Carnivore': 20}
+        herb, _ = isl.distrubution()
+        assert sum(herb[4]) > 0
+        assert len(isl.animal_columns('herbivore')['weight']) == 200
+    finally:
+        isl.close()
+
+
+def test_gather_sends_requested_species():
+    isl = island(geogr, engine='tiled', seed=1, tiles=2)
+    try:
+        isl.add_population(ini_pop)
+        stores = isl._tiles.gather({'carnivore': isl.species['carnivore']})
+        assert list(stores) == ['carnivore']
+        assert len(stores['carnivore'].weight) == 20
+        gathered = []
+        gather = isl._tiles.gather
+        isl._tiles.gather = lambda species: gathered.append(list(species)) or gather(species)
+        assert len(isl.animal_columns('herbivore')['weight']) == 200
+        assert gathered == [['herbivore']]
+    finally:
+        isl.close()
+
+
+def test_tiled_engine_simulation():
+    isl = island(geogr, engine='tiled', seed=1, tiles=2)
+    try:
+        isl.add_population(ini_pop)
+        for _ in range(5):
+            isl.sim_year()
+        herb, carn = isl.distrubution()
+        assert isl.animal_count() == np.sum(herb) + np.sum(carn) > 0
+    finally:
+        isl.close()
+
+
+def test_failing_tile_stops_group():
+    isl = island(geogr, engine='tiled', tiles=3)
+    isl.add_population([{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                                 'weight': 'abc'}]}])
+    with pytest.raises(RuntimeError):
+        isl.sim_year()
+    assert not any(worker.is_alive() for worker in isl._tiles._workers)
+    isl.close()
+
+
+def test_biosim_tiled_options():
+    with BioSim(geogr, ini_pop, seed=1, vis_years=0, engine='tiled', tiles=3,
+                transport=socket_transport()) as sim:
+        sim.simulate(2)
+        workers = sim.island._tiles._workers
+        assert len(workers) == 3
+    assert not any(worker.is_alive() for worker in workers)
+
+
+def _free_address():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()
+
+
+def test_served_tiles_match_local_tiles():
+    # Test that tiles run by serve_tile, as on other machines, give the same island.
+    workers = [_free_address() for _ in range(2)]
+    servers = [multiprocessing.Process(target=serve_tile, args=(address,), daemon=True)
+               for address in workers]
+    for server in servers:
+        server.start()
+    remote = island(geogr, engine='tiled', seed=1, tiles=2,
+                    transport=socket_transport(workers=workers))
+    local = island(geogr, engine='tiled', seed=1, tiles=2)
+    try:
+        for isl in (remote, local):
+            isl.add_population(ini_pop)
+            for _ in range(3):
+                isl.sim_year()
+        assert np.array_equal(np.array(remote.distrubution()), np.array(local.distrubution()))
+        assert np.array_equal(remote.animal_columns('herbivore')['weight'],
+                              local.animal_columns('herbivore')['weight'])
+    finally:
+        remote.close()
+        local.close()
+    for server in servers:
+        server.join(timeout=5)
+        assert not server.is_alive()